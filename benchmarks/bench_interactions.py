@@ -0,0 +1,100 @@
+"""Measure the HTTP interactions endpoint (``BOT_MODE=http``, see ``src/interactions_http.py``).
+
+Signs interaction payloads the way Discord does and POSTs them to a running worker, reporting the latency of
+each request. Start the worker with the public key this script prints (or pass the matching ``--signing-key``):
+
+    uv run benchmarks/bench_interactions.py --print-key
+    BOT_MODE=http DISCORD_PUBLIC_KEY=<public key> uv run main.py
+    uv run benchmarks/bench_interactions.py --signing-key <seed> --command help --requests 200
+
+``--command`` must be a global command registered by the bot, pings (``--command ''``) only exercise the
+signature check.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+from nacl.signing import SigningKey
+
+
+def interaction(command: str, application_id: int, i: int) -> dict:
+    """APPLICATION_COMMAND payload for ``command``, or a PING if it is empty."""
+    if not command:
+        return {"type": 1, "id": str(i), "application_id": str(application_id), "token": "bench", "version": 1}
+    user = {"id": "123456789012345678", "username": "bench", "discriminator": "0", "avatar": None}
+    return {
+        "type": 2,
+        "id": str(1_000_000 + i),
+        "application_id": str(application_id),
+        "token": f"bench-{i}",
+        "version": 1,
+        "channel_id": "1",
+        "user": user,
+        "data": {"id": "1", "name": command, "type": 1},
+        "locale": "en-US",
+    }
+
+
+async def run(url: str, key: SigningKey, command: str, application_id: int, requests: int, concurrency: int):
+    """POST ``requests`` signed interactions, ``concurrency`` at a time, returns the latencies and statuses."""
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(session: aiohttp.ClientSession, i: int) -> None:
+        body = json.dumps(interaction(command, application_id, i)).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Signature-Ed25519": key.sign(timestamp.encode() + body).signature.hex(),
+            "X-Signature-Timestamp": timestamp,
+        }
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.post(url, data=body, headers=headers) as response:
+                data = await response.json() if response.status == 200 else {}
+            latencies.append(time.perf_counter() - start)
+        status = f"{response.status} type {data.get('type')}" if data else str(response.status)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(one(session, i) for i in range(requests)))
+    return latencies, statuses
+
+
+def main():
+    """Send signed interactions to a worker and print latency percentiles."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080/interactions")
+    parser.add_argument("--signing-key", help="hex seed of the signing key, a new one is generated if empty")
+    parser.add_argument("--print-key", action="store_true", help="print a new seed and its public key and exit")
+    parser.add_argument("--command", default="help", help="slash command to invoke, empty for pings")
+    parser.add_argument("--application-id", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    key = SigningKey(bytes.fromhex(args.signing_key)) if args.signing_key else SigningKey.generate()
+    if args.print_key or not args.signing_key:
+        print(f"signing key: {bytes(key).hex()}\npublic key:  {key.verify_key.encode().hex()}")
+        if args.print_key:
+            return
+
+    start = time.perf_counter()
+    latencies, statuses = asyncio.run(
+        run(args.url, key, args.command, args.application_id, args.requests, args.concurrency)
+    )
+    wall = time.perf_counter() - start
+    latencies.sort()
+    print(f"{args.requests} requests in {wall:.2f}s ({args.requests / wall:.0f}/s), responses: {statuses}")
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        print(f"{name}: {latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000:8.1f} ms")
+    print(f"mean: {statistics.mean(latencies) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
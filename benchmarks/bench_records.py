@@ -0,0 +1,95 @@
+"""Memory per athlete: pydantic ``ZRacing`` + ``Cyclist`` models against the compact records of src/records.py.
+
+Builds ``--count`` athletes from the example ZRacing record, each with its own values, and measures the memory
+each representation holds with tracemalloc, plus the time to convert between them.
+
+    uv run benchmarks/bench_records.py --count 10000
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from datetime import UTC, datetime
+from pathlib import Path
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.records import CyclistRecord, ZRacingRecord  # noqa: E402
+from src.schema import Cyclist, ZRacing  # noqa: E402
+
+
+def athlete_payloads(count: int) -> list[tuple[dict, dict]]:
+    """(cyclist, zracing) API payloads, the example record with per athlete ids, names and numbers."""
+    with open(ROOT / "src" / "cogs" / "zr_record_example.json") as f:
+        example = json.load(f)[0]
+    now = datetime.now(UTC).isoformat()
+    payloads = []
+    for i in range(count):
+        zr_record = json.loads(json.dumps(example))
+        zr_record.update(uuid=str(uuid4()), riderId=100000 + i, name=f"Rider {i}", created=now, modified=now)
+        for key, value in zr_record["power"].items():
+            zr_record["power"][key] = value * (1 + i % 97 / 1000)
+        cyclist = {
+            "first_name": "Rider",
+            "last_name": str(i),
+            "zwift_id": 100000 + i,
+            "discord_id": 123456789012345678 + i,
+            "ids": {"zwift_verified": True},
+            "created": now,
+            "modified": now,
+        }
+        payloads.append((cyclist, zr_record))
+    return payloads
+
+
+def measure(build) -> tuple[object, int]:
+    """Run ``build`` and return its result with the bytes still allocated by it."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    """Print bytes per athlete of each representation and the conversion cost."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args()
+
+    payloads = athlete_payloads(args.count)
+    # Build the validators first, their one-off cost is not per record.
+    Cyclist.model_validate(payloads[0][0])
+    ZRacing.model_validate(payloads[0][1])
+
+    models, model_bytes = measure(lambda: [(Cyclist.model_validate(c), ZRacing.model_validate(z)) for c, z in payloads])
+    records, record_bytes = measure(
+        lambda: [(CyclistRecord.from_model(c), ZRacingRecord.from_model(z)) for c, z in models]
+    )
+    # Timed again without tracemalloc, which slows allocations down.
+    start = time.perf_counter()
+    for cyclist, zr in models:
+        CyclistRecord.from_model(cyclist)
+        ZRacingRecord.from_model(zr)
+    to_record = (time.perf_counter() - start) / args.count
+    start = time.perf_counter()
+    for cyclist, zr in records:
+        cyclist.to_model()
+        zr.to_model()
+    to_model = (time.perf_counter() - start) / args.count
+
+    print(f"{args.count} athletes (Cyclist + ZRacing)")
+    print(f"{'pydantic':>10}: {model_bytes / args.count:8.0f} bytes per athlete")
+    print(
+        f"{'compact':>10}: {record_bytes / args.count:8.0f} bytes per athlete ({model_bytes / record_bytes:.1f}x less)"
+    )
+    print(f"{'convert':>10}: {to_record * 1e6:8.1f} us to compact, {to_model * 1e6:.1f} us back to pydantic")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Compare the default and PERFORMANCE_MODE runtimes.
+
+Runs a local fake API server and measures lookup command throughput (``api_lookup_athlete``) and guild-sync
+time (``guild_build_post_data`` + ``guild_post_join_update`` over many guilds) once per mode. Each mode runs in
+its own process because the event loop and JSON codec are selected at import time.
+
+    uv run benchmarks/bench_runtime.py --lookups 2000 --guilds 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def lookup_payload() -> dict:
+    """Lookup response built from the example ZRacing record."""
+    with open(ROOT / "src" / "cogs" / "zr_record_example.json") as f:
+        zr_record = json.load(f)[0]
+    now = datetime.now(UTC).isoformat()
+    zr_record.update(uuid=str(uuid4()), created=now, modified=now)
+    athlete = {
+        "first_name": "Fred",
+        "last_name": "Rider",
+        "zwift_id": zr_record["riderId"],
+        "discord_id": 123456789012345678,
+        "ids": {"zwift_verified": True},
+        "created": now,
+        "modified": now,
+    }
+    return {"athlete": athlete, "zracing": zr_record}
+
+
+def fake_guild(i: int) -> SimpleNamespace:
+    """Just enough of a discord.Guild for guild_build_post_data."""
+    channels = [SimpleNamespace(name=f"channel-{c}", id=100000000000000000 + c) for c in range(40)]
+    categories = [
+        SimpleNamespace(name=f"category-{c}", id=200000000000000000 + c, channels=channels[:8]) for c in range(5)
+    ]
+    roles = [SimpleNamespace(name=f"role-{r}", id=300000000000000000 + r) for r in range(30)]
+    guild_id = 400000000000000000 + i
+    return SimpleNamespace(
+        id=guild_id,
+        name=f"Guild {i}",
+        owner=SimpleNamespace(name="owner"),
+        owner_id=500000000000000000,
+        icon=None,
+        categories=categories,
+        channels=channels,
+        roles=roles,
+        default_role=roles[0],
+        member_count=250,
+        jump_url=f"https://discord.com/channels/{guild_id}",
+        large=False,
+        created_at=datetime.now(UTC),
+    )
+
+
+async def start_fake_api():
+    """Serve the lookup and guild update endpoints on a random local port."""
+    from aiohttp import web
+
+    body = json.dumps(lookup_payload())
+
+    async def lookup(_request):
+        return web.Response(text=body, content_type="application/json")
+
+    async def join_update(request):
+        await request.read()
+        return web.json_response({"status": True, "guild_created": False, "club_created": False})
+
+    app = web.Application()
+    app.router.add_get("/lookup_athlete/", lookup)
+    app.router.add_post("/guild/join_update/", join_update)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def run_child(lookups: int, guilds: int, concurrency: int) -> dict:
+    """Run the measurements in the current process and runtime."""
+    runner, api_url = await start_fake_api()
+    os.environ["API_URL"] = api_url
+
+    from src.api import api_lookup_athlete
+    from src.cogs.server_cog import guild_build_post_data, guild_post_join_update
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_lookup(i: int):
+        async with semaphore:
+            data = await api_lookup_athlete(discord_id=str(i))
+            assert data.status_code == 200, data.status_message
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_lookup(i) for i in range(lookups)))
+    lookup_seconds = time.perf_counter() - start
+
+    fake_guilds = [fake_guild(i) for i in range(guilds)]
+    start = time.perf_counter()
+    for guild in fake_guilds:
+        post_data = await guild_build_post_data(guild, status="UPDATE")
+        await guild_post_join_update(post_data)
+    sync_seconds = time.perf_counter() - start
+
+    await runner.cleanup()
+    return {
+        "lookups_per_second": round(lookups / lookup_seconds, 1),
+        "guild_sync_seconds": round(sync_seconds, 3),
+    }
+
+
+def child_main(args):
+    """Entry point of a single-mode measurement process."""
+    import logfire
+
+    logfire.configure(send_to_logfire=False, console=False)
+
+    from src.runtime import install_event_loop, runtime_info
+
+    install_event_loop()
+    result = asyncio.run(run_child(args.lookups, args.guilds, args.concurrency))
+    result.update(runtime_info())
+    print(json.dumps(result))
+
+
+def main():
+    """Run every mode in a subprocess and print the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child_main(args)
+        return
+
+    for mode in ("False", "True"):
+        env = {**os.environ, "PERFORMANCE_MODE": mode}
+        cmd = [sys.executable, __file__, "--child", *sys.argv[1:]]
+        out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+        print(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Track bot startup time, phase by phase.
+
+Runs ``main.py`` in fresh processes and reports the median of each startup phase (see ``src/startup.py``).
+Offline (the default) ``Bot.run`` is replaced so the process exits right after the cogs are loaded, this covers
+config, import, init and cog_load. With ``--live`` the bot really logs in with ``DISCORD_BOT_TOKEN`` and closes
+itself once it is ready, adding connect, ready and sync, which gives time-to-ready. Live runs alternate between a
+fresh IDENTIFY and a RESUME of the session the previous run saved on close (see ``src/session.py``), the two are
+reported separately.
+
+    uv run benchmarks/bench_startup.py --runs 10
+    uv run benchmarks/bench_startup.py --runs 6 --live
+"""
+
+import argparse
+import asyncio
+import importlib.abc
+import importlib.util
+import json
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class _PatchBotRun(importlib.abc.MetaPathFinder):
+    """Patch ``discord.Bot.run`` right after main.py imports discord, without importing it earlier ourselves."""
+
+    def __init__(self, live: bool):
+        self.live = live
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname != "discord":
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(fullname)
+        exec_module = spec.loader.exec_module
+
+        def exec_and_patch(module):
+            exec_module(module)
+            _patch(module, self.live)
+
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+
+def _patch(discord, live: bool) -> None:
+    from src.startup import startup_timer
+
+    run = discord.Bot.run
+
+    def offline_run(self, *_args, **_kwargs):
+        startup_timer.mark("run")
+
+    def live_run(self, *args, **kwargs):
+        async def close_when_ready():
+            # on_ready marks "sync" after the commands are synced, the timing is complete from then on.
+            while "sync" not in startup_timer.phases:
+                await asyncio.sleep(0.05)
+            await self.close()
+
+        self.add_listener(close_when_ready, "on_ready")
+        run(self, *args, **kwargs)
+
+    discord.Bot.run = live_run if live else offline_run
+
+
+def child_main(live: bool) -> None:
+    """Start the bot once in this process and print its startup report."""
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+    from src.startup import startup_timer
+
+    sys.meta_path.insert(0, _PatchBotRun(live))
+    runpy.run_path(str(ROOT / "main.py"), run_name="__main__")
+    print(json.dumps(startup_timer.report()))
+
+
+def main():
+    """Start the bot ``--runs`` times in fresh processes and print the median of each phase."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="log in to Discord, needs DISCORD_BOT_TOKEN")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child_main(args.live)
+        return
+
+    session_file = Path(tempfile.gettempdir()) / "bench_gateway_session.json"
+    env = {
+        **os.environ,
+        "LOGFIRE_SEND_TO_LOGFIRE": "false",
+        "LOGFIRE_CONSOLE": "false",
+        "GATEWAY_SESSION_FILE": str(session_file),
+    }
+    if not args.live:
+        env.setdefault("DISCORD_BOT_TOKEN", "offline")
+    cmd = [sys.executable, __file__, "--child", *(["--live"] if args.live else [])]
+    runs: dict[str, list[tuple[dict, float]]] = {}
+    for i in range(args.runs):
+        if i % 2 == 0:
+            session_file.unlink(missing_ok=True)
+        start = time.perf_counter()
+        out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+        wall = time.perf_counter() - start
+        report = json.loads(out.stdout.strip().splitlines()[-1])
+        runs.setdefault("resume" if "resume" in report else "identify" if args.live else "offline", []).append(
+            (report, wall)
+        )
+    session_file.unlink(missing_ok=True)
+
+    for kind, results in runs.items():
+        print(f"{kind}, {len(results)} runs:")
+        for phase in results[0][0]:
+            print(f"{phase:>10}: {statistics.median(r[phase] for r, _ in results):8.1f} ms")
+        wall = statistics.median(w for _, w in results)
+        print(f"{'process':>10}: {wall * 1000:8.1f} ms (wall, including interpreter start and exit)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 """Main bot file."""
 
+from src.startup import startup_timer  # noqa: I001, first so the startup clock covers every import
+
 from pydantic_settings import BaseSettings
 
 
@@ -14,15 +16,55 @@ class Settings(BaseSettings):
     API_URL: str = "http://127.0.0.1:8000/api_v1/discord"
     API_KEY: str = ""
     DISCORD_BOT_TOKEN: str
+    PERFORMANCE_MODE: bool = False  # uvloop + msgspec when installed, see src/runtime.py
+    NEGATIVE_CACHE_TTL: int = 300  # seconds to remember athlete lookups that were not found
+    ATHLETE_CACHE_TTL: int = 900  # seconds successful lookups are kept, for autocomplete and when the API fails
+    ATHLETE_CACHE_FRESH: float = 60  # seconds a successful lookup is served without asking the API again
+    GUILD_FINGERPRINT_TTL: int = 259200  # unchanged guilds are re-posted at least this often
+    ROSTER_CACHE_TTL: int = 600  # seconds a guild roster is kept for /club_leaderboard
+    ROSTER_FETCH_CONCURRENCY: int = 8  # max concurrent athlete lookups when building a roster
+    ROSTER_MAX_MEMBERS: int = 1000  # members looked up per roster
+    ATHLETE_INDEX_REFRESH_MINUTES: float = 10  # how often the /lookup_athlete autocomplete index is rebuilt
+    MAX_VIEWS_PER_GUILD: int = 25  # live paginated views per guild, the oldest is expired past this
+    API_TIMEOUT: float = 10.0  # seconds, shared HTTP client
+    HEDGE_DELAY: float = 1.0  # seconds before a duplicate read request is sent
+    RETRY_MAX_ATTEMPTS: int = 3  # attempts for read requests, including the first
+    RETRY_BACKOFF_BASE: float = 0.2  # seconds, doubled per attempt, with full jitter
+    RETRY_BACKOFF_CAP: float = 2.0  # seconds
+    RETRY_BUDGET_RATIO: float = 0.2  # retries + hedges allowed per request
+    API_INTERACTIVE_CONCURRENCY: int = 16  # API calls in flight for commands
+    API_BACKGROUND_CONCURRENCY: int = 4  # max API calls in flight for the guild sweep, joins and roster fetches
+    API_BACKGROUND_MIN_CONCURRENCY: int = 1  # background concurrency never backs off below this
+    API_LATENCY_TARGET: float = 1.0  # seconds, slower interactive calls shrink background concurrency
+    API_MAX_ERROR_RATE: float = 0.1  # smoothed share of failed API calls that shrinks background concurrency
+    API_DECREASE_INTERVAL: float = 2.0  # seconds between background concurrency cuts
+    PROFILE_DIR: str = "profiles"  # where /profile writes its reports
+    PROFILE_INTERVAL: float = 0.005  # seconds between profiler samples
+    MEMORY_CHECK_MINUTES: float = 5  # how often the memory watchdog logs RSS and object counts
+    MEMORY_THRESHOLD_MB: float = 0  # RSS that triggers an allocation snapshot, 0 disables
+    MEMORY_SNAPSHOT_COOLDOWN: float = 3600  # seconds between threshold snapshots
+    MEMORY_TRACEMALLOC: bool = False  # trace allocations from startup instead of from the first snapshot
+    MEMORY_TRACE_FRAMES: int = 1  # frames per traced allocation
+    MEMORY_TOP_N: int = 15  # allocation sites reported per snapshot
+    CHUNK_GUILDS_AT_STARTUP: bool = True  # False fetches member lists after on_ready, get_member misses until then
+    GATEWAY_SESSION_FILE: str = "data/gateway_session.json"  # gateway session saved on shutdown, resumed on start
+    GATEWAY_RESUME_WINDOW: float = 60  # seconds a saved session is tried, older ones identify
+    BOT_MODE: str = "gateway"  # "http" serves slash commands on an HTTP endpoint, see src/interactions_http.py
+    DISCORD_PUBLIC_KEY: str = ""  # application public key, verifies interaction requests in http mode
+    INTERACTIONS_HOST: str = "0.0.0.0"
+    INTERACTIONS_PORT: int = 8080
+    INTERACTIONS_PATH: str = "/interactions"
+    INTERACTIONS_RESPONSE_TIMEOUT: float = 2.5  # seconds before a slow command is deferred on its behalf
+    INTERACTIONS_MAX_CLOCK_SKEW: float = 5  # seconds a signed request's timestamp may be off, older ones are replays
+    CACHE_DIR: str | None = None  # set to keep the caches in a SQLite file across restarts
 
     class Config:  # noqa: D106
         env_file = ".env"
 
-    @classmethod
-    def set_environment(cls, overwrite=False):  # noqa: D102
+    def set_environment(self, overwrite=False):  # noqa: D102
         import os
 
-        for key, value in cls().model_dump().items():
+        for key, value in self.model_dump().items():
             if value is not None:
                 if overwrite:
                     os.environ[key] = str(value)
@@ -38,7 +80,10 @@ settings.set_environment()
 import logfire  # noqa: E402
 
 logfire.configure()
+startup_timer.mark("config")
 
 from src.bot.client import init_bot  # noqa: E402
 
+startup_timer.mark("import")
+
 init_bot()
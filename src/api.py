@@ -1,3 +1,4 @@
+import asyncio
 import os
 import urllib
 
@@ -5,7 +6,12 @@ import httpx
 import logfire
 from discord import ValidationError
 
+from src.cache import athlete_cache, athlete_cache_key, negative_athlete_cache
+from src.request_policy import get_client, read_policy
+from src.runtime import json_loads
+from src.scheduler import api_scheduler, background
 from src.schema import DiscordMagicLinkResponse, LocalGetMagicLinkResponse, LookUpAthlete
+from src.search import athlete_index, lookup_names
 
 
 def format_handicaps(zr_record) -> str:
@@ -70,51 +76,52 @@ async def get_magic_link(
                 case _:
                     raise ValueError(f"Unknown API type: {api}")
 
-            async with httpx.AsyncClient() as client:
-                logfire.info(f"Getting magic link for :{discord_id}")
-                logfire.info(f"Request url: {url}")
-                response = await client.get(url, headers=headers)
-                logfire.info(f"Response status_code: {response.status_code}, {response.text}")
-                if response.status_code == 200:
-                    discord_magic_link: DiscordMagicLinkResponse = DiscordMagicLinkResponse.model_validate(
-                        response.json()
-                    )
-                    logfire.info(f"Magic link: {discord_magic_link}")
-                    data = LocalGetMagicLinkResponse(
-                        status_code=response.status_code,
-                        status_message=response.text,
-                        api=api,
-                        discord_id=discord_id,
-                        guild_id=guild_id,
-                        guild_name=guild_name,
-                        url=discord_magic_link.url,
-                        expires_at=discord_magic_link.expires_at,
-                        uuid=discord_magic_link.uuid,
-                    )
-                    logfire.info(f"Magic link: {data}")
-                    return data
-                else:
-                    logfire.error(f"Response status_code: {response.status_code}, {response.status_message}")
-                    data = LocalGetMagicLinkResponse(
-                        status_code=response.status_code,
-                        status_message=response.text,
-                        api=api,
-                        discord_id=discord_id,
-                        guild_id=guild_id,
-                        guild_name=guild_name,
-                        url=None,
-                        expires_at=None,
-                        uuid=None,
-                    )
-                    logfire.error(f"Error getting magic link, {data}")
-                    return data
+            logfire.info(f"Getting magic link for :{discord_id}")
+            logfire.info(f"Request url: {url}")
+            async with api_scheduler.slot() as call:
+                response = await get_client().get(url, headers=headers)
+                call.failed = response.status_code >= 500
+            logfire.info(f"Response status_code: {response.status_code}, {response.text}")
+            if response.status_code == 200:
+                discord_magic_link: DiscordMagicLinkResponse = DiscordMagicLinkResponse.model_validate(
+                    json_loads(response.content)
+                )
+                logfire.info(f"Magic link: {discord_magic_link}")
+                data = LocalGetMagicLinkResponse(
+                    status_code=response.status_code,
+                    status_message=response.text,
+                    api=api,
+                    discord_id=discord_id,
+                    guild_id=guild_id,
+                    guild_name=guild_name,
+                    url=discord_magic_link.url,
+                    expires_at=discord_magic_link.expires_at,
+                    uuid=discord_magic_link.uuid,
+                )
+                logfire.info(f"Magic link: {data}")
+                return data
+            else:
+                logfire.error(f"Response status_code: {response.status_code}, {response.reason_phrase}")
+                data = LocalGetMagicLinkResponse(
+                    status_code=response.status_code,
+                    status_message=response.text,
+                    api=api,
+                    discord_id=discord_id,
+                    guild_id=guild_id,
+                    guild_name=guild_name,
+                    url=None,
+                    expires_at=None,
+                    uuid=None,
+                )
+                logfire.error(f"Error getting magic link, {data}")
+                return data
         except Exception as e:
             logfire.error(
                 "Unknown error building magic link with params:\n"
                 f"{api}, {discord_id}, {guild_id}, {guild_name}\n"
                 f"Error: {e!s}"
             )
-            LocalGetMagicLinkResponse(
+            data = LocalGetMagicLinkResponse(
                 status_code=500,
                 status_message="Unknown error building magic link with params:",
                 api=api,
@@ -128,6 +135,36 @@ async def get_magic_link(
             return data
 
 
+def is_not_found(data: LookUpAthlete) -> bool:
+    """Return True if the API says the athlete is not registered, as opposed to a failed request."""
+    return data.status_code == 404
+
+
+def athlete_cache_keys(discord_id: int) -> set[tuple[str, str]]:
+    """Every cache key the lookups of a Discord user may be stored under, its Zwift IDs as far as they are known."""
+    key = athlete_cache_key(discord_id=discord_id)
+    zwift_ids = {zwift_id for zwift_id, d in athlete_index.discord_ids.items() if d == discord_id}
+    found = athlete_cache.get(key)
+    if found is not None:
+        zwift_ids.update(lookup_names(found))
+    return {key} | {athlete_cache_key(zwift_id=zwift_id) for zwift_id in zwift_ids}
+
+
+def cache_found_athlete(cache_key: tuple[str, str], data: LookUpAthlete) -> None:
+    """Cache a successful lookup under every key it can be looked up by, and make it searchable."""
+    keys = {cache_key}
+    if data.athlete is not None:
+        keys.add(athlete_cache_key(discord_id=data.athlete.discord_id))
+        keys.add(athlete_cache_key(zwift_id=data.athlete.zwift_id))
+    if data.zracing is not None:
+        keys.add(athlete_cache_key(zwift_id=data.zracing.riderId))
+    for key in keys:
+        athlete_cache.set(key, data)
+        # Registered since a lookup by another key missed.
+        negative_athlete_cache.invalidate(key)
+    athlete_index.add_lookup(data)
+
+
 async def api_lookup_athlete(discord_id: str = "", zwift_id: str = "") -> LookUpAthlete:
     """Look up cyclist information using the API.
 
@@ -142,90 +179,139 @@ async def api_lookup_athlete(discord_id: str = "", zwift_id: str = "") -> LookUp
 
     """
     with logfire.span("lookup_api"):
-        async with httpx.AsyncClient() as client:
-            params = dict()
-            if zwift_id:
-                params["zwift_id"] = zwift_id
-            if discord_id:
-                params["discord_id"] = discord_id
-            logfire.info(f"API Lookup Params: {params}")
-            try:
-                response = await client.get(
-                    f"{os.getenv('API_URL')}/lookup_athlete/",
-                    params=params,
-                    timeout=10.0,
-                )
+        cache_key = athlete_cache_key(discord_id=discord_id, zwift_id=zwift_id)
+        not_found = negative_athlete_cache.get(cache_key)
+        if not_found is not None:
+            logfire.info(f"Negative cache hit: {cache_key}, {negative_athlete_cache.stats()}")
+            return not_found
+        found = athlete_cache.get(cache_key)
+        if found is not None:
+            # May come from the persistent store, written before a restart and not indexed yet.
+            athlete_index.add_lookup(found)
+            if athlete_cache.age(cache_key) <= float(os.getenv("ATHLETE_CACHE_FRESH", "60")):
+                logfire.info(f"Athlete cache hit: {cache_key}, {athlete_cache.stats()}")
+                return found
 
-                logfire.info(f"Response: {response.status_code}")
-                if response.status_code == 200:
-                    logfire.info("Found cyclist information")
-                    data = response.json()
-                    # for i in data["cyclist"].items():
-                    #     logfire.info(f"item: {i}")
-                    data["status_code"] = 200
-                    data["status_message"] = "OK"
-                    logfire.info(f"Cyclist data: {data.keys()}")
-
-                else:  # TODO, should have better plan for different error codes.
-                    logfire.error(f"Status code not 200: {response.status_code}, {response}")
-                    try:
-                        error_detail = response.json().get("detail", "Unknown error 1")
-                    except Exception as e:
-                        logfire.error(f"Error parsing response: {e!s}")
-                        error_detail = "Unknown error 2"
-                    data = {
-                        "status_code": response.status_code,
-                        "status_message": error_detail,
-                        "cyclist": None,
-                        "zracing": None,
-                    }
-                logfire.info("Validate the data")
-                v_data = LookUpAthlete.model_validate(data)
-                return v_data
-
-            except ValidationError as e:
-                logfire.error(f"ValidationError: {e!s}")
-                data = {
-                    "status_code": response.status_code,
-                    "status_message": "Invalid input",
-                    "cyclist": None,
-                    "zracing": None,
-                }
-                return LookUpAthlete.model_validate(data)
-            except httpx.ConnectTimeout:
-                logfire.error("API request timed out")
-                data = {
-                    "status_code": response.status_code,
-                    "status_message": "Request timed out while looking up the cyclist.",
-                    "cyclist": None,
-                    "zracing": None,
-                }
-                return LookUpAthlete.model_validate(data)
-            except httpx.HTTPStatusError as e:
-                logfire.error(f"API error: Status {e.response.status_code}, Response: {e.response.text}")
-                data = {
-                    "status_code": response.status_code,
-                    "status_message": "An error occurred while looking up the cyclist.",
-                    "cyclist": None,
-                    "zracing": None,
-                }
-                return LookUpAthlete.model_validate(data)
-            except httpx.RequestError as e:
-                logfire.error(f"Request failed: {e!s}")
-                data = {
-                    "status_code": response.status_code,
-                    "status_message": "An error occurred while connecting to the registration service.",
-                    "cyclist": None,
-                    "zracing": None,
-                }
-                return LookUpAthlete.model_validate(data)
-            except Exception as e:
-                logfire.error(f"Unexpected error while looking up cyclist: {e!s}")
+        data = await fetch_athlete(cache_key, discord_id, zwift_id)
+        if found is not None and data.status_code != 200 and not is_not_found(data):
+            logfire.warn(f"Lookup failed with {data.status_code}, serving the cached lookup of {cache_key}")
+            return found
+        return data
+
+
+async def fetch_athlete(cache_key: tuple[str, str], discord_id: str = "", zwift_id: str = "") -> LookUpAthlete:
+    """Look up an athlete over the API and cache the answer, errors come back as a LookUpAthlete too."""
+    with logfire.span("lookup_api fetch"):
+        response = None
+        params = dict()
+        if zwift_id:
+            params["zwift_id"] = zwift_id
+        if discord_id:
+            params["discord_id"] = discord_id
+        logfire.info(f"API Lookup Params: {params}")
+        try:
+            # Hedged and retried, see src/request_policy.py
+            response = await read_policy.get(f"{os.getenv('API_URL')}/lookup_athlete/", params=params)
+
+            logfire.info(f"Response: {response.status_code}")
+            if response.status_code == 200:
+                logfire.info("Found cyclist information")
+                data = json_loads(response.content)
+                # for i in data["cyclist"].items():
+                #     logfire.info(f"item: {i}")
+                data["status_code"] = 200
+                data["status_message"] = "OK"
+                logfire.info(f"Cyclist data: {data.keys()}")
+
+            else:  # TODO, should have better plan for different error codes.
+                logfire.error(f"Status code not 200: {response.status_code}, {response}")
+                try:
+                    error_detail = json_loads(response.content).get("detail", "Unknown error 1")
+                except Exception as e:
+                    logfire.error(f"Error parsing response: {e!s}")
+                    error_detail = "Unknown error 2"
                 data = {
                     "status_code": response.status_code,
-                    "status_message": "Unexpected error while looking up cyclist",
+                    "status_message": error_detail,
                     "cyclist": None,
                     "zracing": None,
                 }
-                logfire.error(f"Error: {data}")
-                return LookUpAthlete.model_validate(data)
+            logfire.info("Validate the data")
+            v_data = LookUpAthlete.model_validate(data)
+            if v_data.status_code == 200:
+                cache_found_athlete(cache_key, v_data)
+            elif is_not_found(v_data):
+                negative_athlete_cache.set(cache_key, v_data)
+            return v_data
+
+        except ValidationError as e:
+            logfire.error(f"ValidationError: {e!s}")
+            data = {
+                "status_code": response.status_code if response is not None else 500,
+                "status_message": "Invalid input",
+                "cyclist": None,
+                "zracing": None,
+            }
+            return LookUpAthlete.model_validate(data)
+        except httpx.TimeoutException:
+            logfire.error(f"API request timed out, {read_policy.stats()}")
+            data = {
+                "status_code": 504,
+                "status_message": "Request timed out while looking up the cyclist.",
+                "cyclist": None,
+                "zracing": None,
+            }
+            return LookUpAthlete.model_validate(data)
+        except httpx.HTTPStatusError as e:
+            logfire.error(f"API error: Status {e.response.status_code}, Response: {e.response.text}")
+            data = {
+                "status_code": e.response.status_code,
+                "status_message": "An error occurred while looking up the cyclist.",
+                "cyclist": None,
+                "zracing": None,
+            }
+            return LookUpAthlete.model_validate(data)
+        except httpx.RequestError as e:
+            logfire.error(f"Request failed: {e!s}, {read_policy.stats()}")
+            data = {
+                "status_code": 503,
+                "status_message": "An error occurred while connecting to the registration service.",
+                "cyclist": None,
+                "zracing": None,
+            }
+            return LookUpAthlete.model_validate(data)
+        except Exception as e:
+            logfire.error(f"Unexpected error while looking up cyclist: {e!s}")
+            data = {
+                "status_code": response.status_code if response is not None else 500,
+                "status_message": "Unexpected error while looking up cyclist",
+                "cyclist": None,
+                "zracing": None,
+            }
+            logfire.error(f"Error: {data}")
+            return LookUpAthlete.model_validate(data)
+
+
+async def api_lookup_athletes(discord_ids: list[str | int], concurrency: int | None = None) -> dict[str, LookUpAthlete]:
+    """Look up many athletes at once, at most ``concurrency`` requests in flight.
+
+    Cached and not-found lookups are answered by api_lookup_athlete without touching the API. The lookups run as
+    background API calls so a large roster does not hold up other users' commands.
+
+    Returns:
+        dict: discord_id -> LookUpAthlete, for every id requested
+
+    """
+    if concurrency is None:
+        concurrency = int(os.getenv("ROSTER_FETCH_CONCURRENCY", "8"))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(discord_id: str) -> LookUpAthlete:
+        async with semaphore:
+            return await api_lookup_athlete(discord_id=discord_id)
+
+    with logfire.span(f"lookup_api bulk: {len(discord_ids)}"), background():
+        ids = [str(discord_id) for discord_id in discord_ids]
+        results = await asyncio.gather(*(lookup(discord_id) for discord_id in ids))
+        logfire.info(f"Bulk lookup done, {api_scheduler.stats()}")
+        return dict(zip(ids, results, strict=True))
@@ -1,10 +1,35 @@
 """Primary Client class that runs the bot"""
 
+import asyncio
 import os
+import time
+from functools import partial
 
 import discord as pycord
-import httpx
 import logfire
+from discord.ext import commands
+
+from src.runtime import install_event_loop, runtime_info
+from src.session import ResumableBot
+from src.startup import startup_timer
+
+# Owner commands and optional modes import what they need when they run, not when the bot starts.
+
+# Commands and background jobs /profile can profile per invocation.
+PROFILE_TARGETS = ["lookup_athlete", "my_profile", "club_leaderboard", "compare_riders", "pust_guild_update"]
+COGS = ("src.cogs.club_cog", "src.cogs.cyclist_cog", "src.cogs.server_cog")
+# Event listeners and background jobs, not loaded by HTTP interaction workers (BOT_MODE=http).
+GATEWAY_ONLY_COGS = ("src.cogs.server_cog",)
+_background: set[asyncio.Task] = set()
+
+
+async def chunk_guilds(bot: pycord.Bot) -> None:
+    """Fetch the member lists after ready instead of before, one guild at a time to stay under the rate limit."""
+    with logfire.span("Chunk guilds"):
+        for guild in bot.guilds:
+            if not guild.chunked:
+                await guild.chunk()
+        logfire.info(f"Chunked {len(bot.guilds)} guilds")
 
 
 def init_bot():
@@ -23,25 +48,69 @@ def init_bot():
 
     logfire.info(f"Intents: {intents}")
 
+    event_loop = install_event_loop()
+    logfire.info(f"Event loop: {event_loop}, runtime: {runtime_info()}")
+
+    if os.getenv("MEMORY_TRACEMALLOC", "False").lower() == "true":
+        from src.memory import watchdog
+
+        watchdog.start_tracing()
+
     logfire.info("Initialize bot")
-    bot = pycord.Bot(command_prefix="!", intents=intents)
+    # Chunking every guild before on_ready delays ready by seconds per large guild. CHUNK_GUILDS_AT_STARTUP=False
+    # fetches the member lists in the background once the bot is ready instead, until then guild.get_member misses.
+    chunk_at_startup = os.getenv("CHUNK_GUILDS_AT_STARTUP", "True").lower() == "true"
+    bot = ResumableBot(command_prefix="!", intents=intents, chunk_guilds_at_startup=chunk_at_startup)
+    startup_timer.mark("init")
     logfire.info("Run bot")
 
+    @bot.listen("on_connect")
+    async def on_connect_timed():
+        if "connect" not in startup_timer.phases:
+            startup_timer.mark("connect")
+
+    @bot.listen("on_resumed")
+    async def on_resumed_timed():
+        # Resumed the session saved by the previous process: no on_connect, on_ready follows the guild rebuild.
+        if bot.restoring and "resume" not in startup_timer.phases:
+            startup_timer.mark("resume")
+
     @bot.event
     async def on_ready():
         """Sync commands."""
+        first_ready = "ready" not in startup_timer.phases
+        if first_ready:
+            startup_timer.mark("ready")
         try:
             logfire.info("Syncing commands with Discord...")
             await bot.sync_commands()
             logfire.info("Commands synced successfully!")
         except Exception as e:
             logfire.error(f"Failed to sync commands: {e}")
+        from src.memory import memory_watchdog
+
+        if not memory_watchdog.is_running():
+            memory_watchdog.start(bot)
+        if first_ready:
+            startup_timer.mark("sync")
+            logfire.info(f"Startup: {startup_timer.summary()}", **startup_timer.report())
+            # Every guild with CHUNK_GUILDS_AT_STARTUP=False or after a resume, which skips py-cord's chunking.
+            task = bot.loop.create_task(chunk_guilds(bot))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
         logfire.info("Bot is now ready!")
 
     @bot.slash_command(name="about")
     async def about(ctx):
         """Information about the  ID Discord Gotta Bike bot. and app.gotta.bike."""
+        import httpx
+
+        from src.request_policy import read_policy
+        from src.runtime import json_loads
+
         with logfire.span("id_gotta_bike_info"):
+            # The API test is retried, it can take longer than Discord's 3 second response deadline.
+            await ctx.defer(ephemeral=True)
             logfire.info(f"Guild ID: {ctx.guild.id}")
             logfire.info(f"Guild Name: {ctx.guild.name}")
             logfire.info(f"API_URL: {os.getenv('API_URL')}")
@@ -54,17 +123,16 @@ def init_bot():
             try:
                 api_test_url = f"{os.getenv('API_URL')}/api_test"
                 logfire.info(f"Testing API connection: {api_test_url}")
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(api_test_url)
-                    response.raise_for_status()
-                    data = response.json()
-                    logfire.info(
-                        f"API Test Successful!\n"
-                        f"source_ip: {data.get('source_ip', 'failed')}\n"
-                        f" server_version: {data.get('server_version', 'failed')}\n"
-                        f" Other: {data.get('other', 'failed')}"
-                    )
-                    api_server_responded = "PASSED" if data.get("source_ip", "failed") != "failed" else "FAILED"
+                response = await read_policy.get(api_test_url)
+                response.raise_for_status()
+                data = json_loads(response.content)
+                logfire.info(
+                    f"API Test Successful!\n"
+                    f"source_ip: {data.get('source_ip', 'failed')}\n"
+                    f" server_version: {data.get('server_version', 'failed')}\n"
+                    f" Other: {data.get('other', 'failed')}"
+                )
+                api_server_responded = "PASSED" if data.get("source_ip", "failed") != "failed" else "FAILED"
             except httpx.HTTPError as http_err:
                 logfire.error(f"HTTP error while connecting to API: {http_err}")
                 api_server_responded = "HTTP error while connecting to API"
@@ -75,7 +143,7 @@ def init_bot():
         name = ctx.author.name
         dm_link = "https://discord.com/users/588793677317537811"
 
-        await ctx.response.send_message(
+        await ctx.respond(
             f"Hello, {name}, This is the Gotta.Bike Bot!\n"
             f"Website can be found at <https://app.gotta.bike>\n"
             f"The source code is available at <https://github.com/id-gotta-bike/discord-gotta-bike>\n"
@@ -86,15 +154,126 @@ def init_bot():
             ephemeral=True,
         )
 
-    # bot.load_extension("src.cogs.club_cog")
-    bot.load_extension("src.cogs.cyclist_cog")
-    bot.load_extension("src.cogs.server_cog")
+    @bot.slash_command(
+        name="profile",
+        description="Owner only: sample the bot for a time window or the next runs of a command",
+        default_member_permissions=pycord.Permissions(administrator=True),
+    )
+    @commands.is_owner()
+    async def profile(
+        ctx,
+        target: pycord.Option(
+            str, description="Command or job to profile, all if empty", choices=PROFILE_TARGETS, required=False
+        ) = None,
+        invocations: pycord.Option(int, description="Runs of the target to profile", min_value=1, max_value=50) = 1,
+        # The followup with the report needs the interaction token, which expires after 15 minutes.
+        seconds: pycord.Option(
+            int, description="Window length, or how long to wait for the target", min_value=1, max_value=840
+        ) = 30,
+    ):
+        """Profile the bot and attach a collapsed-stack report."""
+        from src.profiling import run_session
+
+        with logfire.span("profile"):
+            await ctx.defer(ephemeral=True)
+            logfire.info(f"Profiling {target or 'window'}: {invocations} invocations, {seconds}s")
+            trigger = None
+            if target == "pust_guild_update":
+                # The sweep runs every 12 hours, run it now rather than wait for it.
+                from src.cogs.server_cog import pust_guild_update
+
+                trigger = partial(pust_guild_update, bot)
+            try:
+                session = await run_session(bot, target, seconds, invocations, trigger=trigger)
+            except ValueError as e:
+                await ctx.respond(f"❌ {e!s}", ephemeral=True)
+                return
+            path = session.write()
+            top = "\n".join(f"{share:6.1%} {frame}" for frame, share in session.profiler.top_functions(10))
+            await ctx.respond(
+                f"Profile of {target or 'all'}: {session.profiler.samples} samples, written to `{path}`\n"
+                f"```\n{top[:1500] or 'no samples'}\n```",
+                file=pycord.File(path),
+                ephemeral=True,
+            )
+
+    @bot.slash_command(
+        name="memory",
+        description="Owner only: memory usage, and a diff of allocation sites since the last snapshot",
+        default_member_permissions=pycord.Permissions(administrator=True),
+    )
+    @commands.is_owner()
+    async def memory(
+        ctx,
+        snapshot: pycord.Option(bool, description="Take an allocation snapshot and diff it", required=False) = True,
+    ):
+        """Report memory usage and the top growing allocation sites."""
+        from src.memory import gc_object_count, object_counts, rss_bytes, watchdog
+
+        with logfire.span("memory"):
+            await ctx.defer(ephemeral=True)
+            counts = object_counts(bot)
+            counts["gc_objects"] = await asyncio.to_thread(gc_object_count)
+            lines = [f"RSS: {rss_bytes() / 2**20:.1f} MiB (peak seen {watchdog.peak_rss / 2**20:.1f} MiB)"]
+            lines.extend(f"{name}: {count}" for name, count in counts.items())
+            sites = await watchdog.snapshot("/memory command") if snapshot else []
+            if snapshot and not sites:
+                lines.append("Baseline snapshot taken, run again later to see what grew.")
+            message = "```\n" + "\n".join(lines) + "\n```"
+            if sites:
+                message += "\nTop growing allocation sites:\n```\n" + "\n".join(sites)[:1500] + "\n```"
+            await ctx.respond(message, ephemeral=True)
+
+    @bot.slash_command(
+        name="reload",
+        description="Owner only: reload cogs in place, without reconnecting to Discord",
+        default_member_permissions=pycord.Permissions(administrator=True),
+    )
+    @commands.is_owner()
+    async def reload(
+        ctx,
+        cog: pycord.Option(str, description="Cog to reload, all if empty", choices=list(COGS), required=False) = None,
+    ):
+        """Reload cog modules, the shared caches, HTTP client and gateway connection are kept."""
+        with logfire.span("reload"):
+            await ctx.defer(ephemeral=True)
+            lines = []
+            for name in [cog] if cog else COGS:
+                start = time.perf_counter()
+                try:
+                    # Atomic: if the new module fails to load the old one is set up again.
+                    bot.reload_extension(name)
+                except pycord.ExtensionError as e:
+                    logfire.error(f"Failed to reload {name}: {e!s}")
+                    lines.append(f"❌ {name}: {e!s}")
+                    continue
+                elapsed = time.perf_counter() - start
+                logfire.info(f"Reloaded {name} in {elapsed:.3f}s")
+                lines.append(f"✅ {name}: {elapsed * 1000:.0f} ms")
+            try:
+                # Only sends the commands that changed.
+                await bot.sync_commands()
+            except Exception as e:
+                logfire.error(f"Failed to sync commands after reload: {e}")
+                lines.append(f"❌ command sync: {e!s}")
+            await ctx.respond("\n".join(lines), ephemeral=True)
+
+    http_mode = os.getenv("BOT_MODE", "gateway").lower() == "http"
+    for cog in COGS:
+        if not (http_mode and cog in GATEWAY_ONLY_COGS):
+            bot.load_extension(cog)
+    startup_timer.mark("cog_load")
 
     logfire.info("Get: DISCORD_BOT_TOKEN")
 
     if not os.getenv("DISCORD_BOT_TOKEN"):
         logfire.error("No token found! Make sure to set DISCORD_BOT_TOKEN in your .env file.")
         raise ValueError("No token found! Make sure to set DISCORD_BOT_TOKEN in your .env file.")
+    if http_mode:
+        from src.interactions_http import run_interactions_server
+
+        run_interactions_server(bot, os.getenv("DISCORD_BOT_TOKEN"))
+        return
     bot.run(os.getenv("DISCORD_BOT_TOKEN"))
     logfire.info("Bot started: if your here it has stopped")
 
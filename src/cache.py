@@ -0,0 +1,296 @@
+"""TTL caches shared by the cogs, optionally backed by a SQLite file so they survive restarts."""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import logfire
+
+from src.runtime import json_dumps, json_loads
+from src.schema import LookUpAthlete
+
+
+class SQLiteStore:
+    """Key/value rows with a wall-clock expiry, one table shared by all caches through a namespace column.
+
+    Nothing is read at startup, the file is only opened on first use and rows are pulled in one by one as the
+    in-memory caches miss. Lookups are by primary key so they are cheap enough to run on the event loop.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL, "
+                "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            logfire.info(f"Persistent cache opened: {self.path}")
+            self._conn = conn
+        return self._conn
+
+    def get(self, namespace: str, key: str) -> tuple[float, bytes] | None:
+        """Return (expires_at, value) if the row exists and has not expired."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT expires_at, value FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+                .fetchone()
+            )
+        if row is None or row[0] < time.time():
+            return None
+        return row
+
+    def set(self, namespace: str, key: str, value: bytes, expires_at: float) -> None:
+        """Insert or replace a row."""
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                (namespace, key, expires_at, value),
+            )
+
+    def values(self, namespace: str) -> list[bytes]:
+        """Every unexpired value of a namespace, a full scan meant for rare bulk reads off the event loop."""
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute("SELECT value FROM cache WHERE namespace = ? AND expires_at >= ?", (namespace, time.time()))
+                .fetchall()
+            )
+        return [row[0] for row in rows]
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Delete a row if it exists."""
+        with self._lock:
+            self._connect().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def close(self) -> None:
+        """Close the connection, it is reopened on next use."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class TTLCache:
+    """Small LRU cache where every entry expires after ``ttl`` seconds.
+
+    Counters are kept per cache so each one can be reported on its own. With a ``store`` every write goes through
+    to disk, and a memory miss falls back to the store, so entries written before a restart are picked up lazily.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        maxsize: int = 10_000,
+        store: SQLiteStore | None = None,
+        encode: Callable[[Any], bytes] = json_dumps,
+        decode: Callable[[bytes], Any] = json_loads,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.store = store
+        self.encode = encode
+        self.decode = decode
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+        CACHES[name] = self
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._data)
+
+    def get(self, key: Any) -> Any | None:
+        """Return the cached value or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._data[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            value = self._load(key)
+            if value is None:
+                self.misses += 1
+            return value
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def age(self, key: Any) -> float | None:
+        """Seconds since ``key`` was set with the default ttl, None if it is not held in memory."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        return self.ttl - (entry[0] - time.monotonic())
+
+    def _load(self, key: Any) -> Any | None:
+        if self.store is None:
+            return None
+        try:
+            row = self.store.get(self.name, store_key(key))
+            if row is None:
+                return None
+            expires_at, raw = row
+            value = self.decode(raw)
+        except Exception as e:
+            logfire.error(f"Persistent cache read failed: {self.name}, {key}, {e!s}")
+            return None
+        self._remember(key, value, expires_at - time.time())
+        self.disk_hits += 1
+        return value
+
+    def _remember(self, key: Any, value: Any, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def set(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        ttl = self.ttl if ttl is None else ttl
+        self._remember(key, value, ttl)
+        if self.store is not None:
+            try:
+                self.store.set(self.name, store_key(key), self.encode(value), time.time() + ttl)
+            except Exception as e:
+                logfire.error(f"Persistent cache write failed: {self.name}, {key}, {e!s}")
+
+    def values(self) -> list[Any]:
+        """Every unexpired value held in memory, the persistent store is not read."""
+        now = time.monotonic()
+        return [value for expires_at, value in self._data.values() if expires_at >= now]
+
+    def stored_values(self) -> list[Any]:
+        """Every unexpired value in the persistent store, empty without one. Blocking, run it in a thread."""
+        if self.store is None:
+            return []
+        values = []
+        for raw in self.store.values(self.name):
+            try:
+                values.append(self.decode(raw))
+            except Exception as e:
+                logfire.error(f"Persistent cache read failed: {self.name}, {e!s}")
+        return values
+
+    def invalidate(self, key: Any) -> bool:
+        """Drop a key, returns True if it was cached in memory."""
+        if self.store is not None:
+            try:
+                self.store.delete(self.name, store_key(key))
+            except Exception as e:
+                logfire.error(f"Persistent cache delete failed: {self.name}, {key}, {e!s}")
+        if self._data.pop(key, None) is None:
+            return False
+        self.invalidations += 1
+        return True
+
+    def clear(self) -> None:
+        """Drop every in-memory entry, the counters and the persistent store are kept."""
+        self._data.clear()
+
+    def stats(self) -> dict[str, int | float | str]:
+        """Counters for logging."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+def store_key(key: Any) -> str:
+    """Flatten a cache key into the text stored on disk."""
+    if isinstance(key, tuple):
+        return ":".join(str(k) for k in key)
+    return str(key)
+
+
+def encode_lookup(data: LookUpAthlete) -> bytes:
+    """Serialize a lookup result for the persistent store."""
+    return json_dumps(data.model_dump(mode="json"))
+
+
+def decode_lookup(raw: bytes) -> LookUpAthlete:
+    """Inverse of encode_lookup."""
+    return LookUpAthlete.model_validate(json_loads(raw))
+
+
+def guild_fingerprint(payload: dict) -> str:
+    """Stable hash of a guild update payload, the JOIN/UPDATE status is ignored."""
+    payload = {k: v for k, v in payload.items() if k != "status"}
+    return hashlib.sha256(json_dumps(payload)).hexdigest()
+
+
+CACHES: dict[str, TTLCache] = {}
+
+persistent_store = SQLiteStore(Path(os.getenv("CACHE_DIR")) / "cache.sqlite3") if os.getenv("CACHE_DIR") else None
+
+# Lookups that came back 404 / "not found". Most guild members never register, so this absorbs repeat lookups
+# of the same unregistered member or mistyped Zwift ID. Kept short, a member can register at any time.
+negative_athlete_cache = TTLCache(
+    "negative_athlete",
+    ttl=float(os.getenv("NEGATIVE_CACHE_TTL", "300")),
+    store=persistent_store,
+    encode=encode_lookup,
+    decode=decode_lookup,
+)
+
+# Successful lookups, stored under both the discord and zwift keys of the athlete. Kept for the autocomplete index
+# and as a fallback when the API fails, a lookup is only answered from here for ATHLETE_CACHE_FRESH seconds: the
+# profile can be edited on the website at any time and the bot is not told.
+athlete_cache = TTLCache(
+    "athlete",
+    ttl=float(os.getenv("ATHLETE_CACHE_TTL", "900")),
+    store=persistent_store,
+    encode=encode_lookup,
+    decode=decode_lookup,
+)
+
+# Embed fields rendered from a successful lookup, keyed by the modified times of the lookup so an edited profile
+# is rendered again, see CyclistCog.lookup_athlete.
+lookup_render_cache = TTLCache(
+    "lookup_render", ttl=float(os.getenv("ATHLETE_CACHE_TTL", "900")), store=persistent_store
+)
+
+# Per guild (and role) rosters for the club leaderboard, kept in memory only, see src/stats.py.
+roster_cache = TTLCache("roster", ttl=float(os.getenv("ROSTER_CACHE_TTL", "600")), maxsize=256)
+
+# Member ids of guilds fetched over REST, scopes autocomplete on HTTP workers that have no member cache.
+guild_member_cache = TTLCache("guild_members", ttl=float(os.getenv("ROSTER_CACHE_TTL", "600")), maxsize=256)
+
+# Fingerprint of the last guild payload the API accepted, lets the sweep skip guilds that did not change.
+guild_fingerprint_cache = TTLCache(
+    "guild_fingerprint", ttl=float(os.getenv("GUILD_FINGERPRINT_TTL", "259200")), store=persistent_store
+)
+
+
+def athlete_cache_key(discord_id: str | int = "", zwift_id: str | int = "") -> tuple[str, str]:
+    """Cache key for an athlete lookup, zwift_id wins over discord_id like in the API."""
+    if zwift_id:
+        return "zwift", str(zwift_id)
+    return "discord", str(discord_id)
@@ -1,5 +1,8 @@
+import asyncio
 import os
+import re
 from datetime import datetime
+from typing import TYPE_CHECKING
 
 import discord
 import httpx
@@ -7,6 +10,100 @@ import logfire
 from discord import ButtonStyle, Color, Embed, ui
 from discord.ext import commands
 
+from src.api import api_lookup_athlete, api_lookup_athletes
+from src.cache import guild_member_cache, roster_cache
+from src.metrics import METRICS, POWER_DURATIONS, TERRAINS, duration_label
+from src.views import PaginatedView
+
+if TYPE_CHECKING:
+    from src.stats import Roster
+
+MAX_COMPARE = 10
+
+
+async def build_roster(members: list[discord.Member]) -> "Roster":
+    """Fetch the ZRacing records of the members and build their roster, unregistered members are left out."""
+    # numpy is loaded with src.stats, on the first roster rather than when the cog loads.
+    from src.stats import Roster
+
+    with logfire.span(f"Build roster: {len(members)} members"):
+        lookups = await api_lookup_athletes([m.id for m in members])
+        riders = [
+            (m.display_name, lookups[str(m.id)].zracing)
+            for m in members
+            if lookups[str(m.id)].status_code == 200 and lookups[str(m.id)].zracing is not None
+        ]
+        logfire.info(f"Roster: {len(riders)} of {len(members)} members have a ZRacing record")
+        return Roster.from_records(riders)
+
+
+async def roster_members(bot: discord.Bot, guild: discord.Guild, role: discord.Role | None) -> list[discord.Member]:
+    """Members to rank, from the member cache, or over REST in an HTTP interactions worker without a gateway."""
+    if bot.ws is None:
+        if role is not None:
+            # The partial guild of an interaction has no roles, fetch the full guild so Member.get_role can match.
+            guild = await bot.fetch_guild(guild.id)
+        members = [m async for m in guild.fetch_members(limit=None)]
+        guild_member_cache.set(guild.id, frozenset(m.id for m in members))
+        if role is not None:
+            members = [m for m in members if m.get_role(role.id) is not None]
+    else:
+        if not guild.chunked:
+            # Member lists are fetched in the background after startup, this guild is not done yet.
+            await guild.chunk()
+        members = role.members if role is not None else guild.members
+    return [m for m in members if not m.bot][: int(os.getenv("ROSTER_MAX_MEMBERS", "1000"))]
+
+
+# Member, role and channel mentions, then bare numbers. Whole mentions match first so their digits are not read
+# as Zwift IDs.
+RIDER_TOKEN = re.compile(r"<@!?(?P<member>\d+)>|<@&\d+>|<#\d+>|(?P<number>\d+)")
+# Discord IDs (snowflakes) have 17 to 19 digits, far more than a Zwift ID.
+SNOWFLAKE = re.compile(r"\d{17,19}")
+
+
+def parse_riders(riders: str) -> list[tuple[str, str]]:
+    """Split '@member 1234 <@5678>' into (discord_id, zwift_id) lookups, in order and without duplicates.
+
+    Role and channel mentions are skipped, bare numbers as long as a Discord ID are looked up as one.
+    """
+    lookups = []
+    for match in RIDER_TOKEN.finditer(riders):
+        member, number = match.group("member"), match.group("number")
+        if member is not None:
+            lookup = (member, "")
+        elif number is None:
+            continue
+        elif SNOWFLAKE.fullmatch(number):
+            lookup = (number, "")
+        else:
+            lookup = ("", number)
+        if lookup not in lookups:
+            lookups.append(lookup)
+    return lookups
+
+
+def format_table(header: list[str], rows: list[tuple[str, list[str]]], name_width: int = 12) -> str:
+    """Build a fixed width text table for a code block in an embed."""
+    widths = [max(len(h), *(len(cells[i]) for _, cells in rows)) for i, h in enumerate(header)]
+    lines = [" ".join([" " * name_width, *(h.rjust(w) for h, w in zip(header, widths, strict=True))])]
+    lines.extend(
+        " ".join([name[:name_width].ljust(name_width), *(c.rjust(w) for c, w in zip(cells, widths, strict=True))])
+        for name, cells in rows
+    )
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def ordinal(n: int) -> str:
+    """1 -> '1st', 2 -> '2nd', 11 -> '11th', 23 -> '23rd'."""
+    suffix = "th" if n % 100 in (11, 12, 13) else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def format_cells(values, value_format: str) -> list[str]:
+    """Format a row of floats, NaN shows as '-'."""
+    return ["-" if v != v else value_format.format(v) for v in values]
+
 
 class CubCog(commands.Cog):
     """Cyclist related cogs."""
@@ -14,6 +111,129 @@ class CubCog(commands.Cog):
     def __init__(self, bot):  # this is a special method that is called when the cog is loaded
         self.bot = bot
 
+    @discord.slash_command(name="club_leaderboard", description="Rank the members of this server or a role")
+    async def club_leaderboard(
+        self,
+        ctx: discord.ApplicationContext,
+        metric: discord.Option(
+            str,
+            description="What to rank by",
+            choices=[discord.OptionChoice(name=label, value=key) for key, (label, _) in METRICS.items()],
+        ),
+        role: discord.Option(discord.Role, description="Only rank members with this role", required=False) = None,
+    ):
+        """Rank server or role members by a ZRacing metric."""
+        with logfire.span("CubCog: club_leaderboard"):
+            await ctx.defer(ephemeral=True)
+            try:
+                cache_key = (ctx.guild.id, role.id if role is not None else None)
+                roster = roster_cache.get(cache_key)
+                if roster is None:
+                    roster = await build_roster(await roster_members(ctx.bot, ctx.guild, role))
+                    roster_cache.set(cache_key, roster)
+
+                label, value_format = METRICS[metric]
+                ranking = roster.ranking(metric)
+                if not ranking:
+                    await ctx.respond(f"No registered riders with a {label} found.", ephemeral=True)
+                    return
+
+                scope = role.name if role is not None else ctx.guild.name or "This server"
+
+                def render(riders, page, pages):
+                    embed = Embed(
+                        title=f"{label} Leaderboard",
+                        description="\n".join(
+                            f"**{r.rank}.** {r.name}: {value_format.format(r.value)} "
+                            f"({ordinal(round(r.percentile))} pct)"
+                            for r in riders
+                        ),
+                        color=Color.blue(),
+                        timestamp=discord.utils.utcnow(),
+                    )
+                    embed.set_footer(
+                        text=f"{scope}: {len(ranking)} of {len(roster)} riders ranked, page {page + 1}/{pages}"
+                    )
+                    return embed
+
+                view = PaginatedView(
+                    guild_id=ctx.guild.id,
+                    total=len(ranking),
+                    fetch=lambda offset, limit: ranking[offset : offset + limit],
+                    render=render,
+                )
+                await view.send(ctx)
+            except Exception as e:
+                logfire.error(f"Unexpected error building the leaderboard: {e!s}")
+                await ctx.respond("❌ An error occurred while building the leaderboard.", ephemeral=True)
+
+    @discord.slash_command(name="compare_riders", description="Compare the power curves and handicaps of riders")
+    async def compare_riders(
+        self,
+        ctx: discord.ApplicationContext,
+        riders: discord.Option(str, description=f"Up to {MAX_COMPARE} @members and/or Zwift IDs"),
+    ):
+        """Compare several riders side by side."""
+        with logfire.span("CubCog: compare_riders"):
+            lookups = parse_riders(riders)
+            if not 2 <= len(lookups) <= MAX_COMPARE:
+                await ctx.respond(f"Give between 2 and {MAX_COMPARE} @members or Zwift IDs.", ephemeral=True)
+                return
+            await ctx.defer(ephemeral=True)
+            try:
+                # All at once, a team costs about the same wall time as one lookup.
+                results = await asyncio.gather(
+                    *(api_lookup_athlete(discord_id=discord_id, zwift_id=zwift_id) for discord_id, zwift_id in lookups)
+                )
+                found = [r.zracing for r in results if r.status_code == 200 and r.zracing is not None]
+                missing = [
+                    f"<@{discord_id}>" if discord_id else zwift_id
+                    for (discord_id, zwift_id), r in zip(lookups, results, strict=True)
+                    if r.status_code != 200 or r.zracing is None
+                ]
+                if len(found) < 2:
+                    await ctx.respond("❌ Need at least 2 riders with a ZRacing record to compare.", ephemeral=True)
+                    return
+
+                from src.stats import column_ranks, handicap_matrix, percent_of_best, power_matrix
+
+                names = [zr.name for zr in found]
+                wkg = power_matrix(found, prefix="wkg")
+                relative = percent_of_best(wkg)
+                handicaps = handicap_matrix(found)
+                handicap_ranks = column_ranks(handicaps)
+
+                durations = [duration_label(s) for s in POWER_DURATIONS]
+                terrains = [t[:5].title() for t in TERRAINS]
+                wkg_rows = [(n, format_cells(r, "{:.1f}")) for n, r in zip(names, wkg, strict=True)]
+                relative_rows = [(n, format_cells(r, "{:.0f}")) for n, r in zip(names, relative, strict=True)]
+                handicap_rows = [
+                    (n, [f"{c} ({k})" if k else c for c, k in zip(format_cells(r, "{:.0f}"), ks, strict=True)])
+                    for n, r, ks in zip(names, handicaps, handicap_ranks, strict=True)
+                ]
+                description = "\n".join(
+                    [
+                        "**Power w/kg**",
+                        format_table(durations, wkg_rows),
+                        "**% of best**",
+                        format_table(durations, relative_rows),
+                        "**Handicaps (rank)**",
+                        format_table(terrains, handicap_rows),
+                    ]
+                )
+                embed = Embed(
+                    title="Rider Comparison",
+                    description=description,
+                    color=Color.blue(),
+                    timestamp=discord.utils.utcnow(),
+                )
+                if missing:
+                    embed.add_field(name="Not found", value=", ".join(missing), inline=False)
+                await ctx.respond(embed=embed, ephemeral=True)
+            except Exception as e:
+                logfire.error(f"Unexpected error comparing riders: {e!s}")
+                await ctx.respond("❌ An error occurred while comparing riders.", ephemeral=True)
+
     # @discord.slash_command(name="my_clubs", description="Get a link to manage your club admin access")
     # async def my_clubs(self, ctx):
     #     """Get a link to manage your club admin access."""
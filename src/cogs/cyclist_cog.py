@@ -1,10 +1,140 @@
+import asyncio
+import os
+from collections.abc import Callable
+
 import discord
 import httpx
 import logfire
 from discord import ButtonStyle, Color, Embed, ui
 from discord.ext import commands, tasks
 
-from src.api import api_lookup_athlete, format_handicaps, format_phenotype, get_magic_link
+from src.api import api_lookup_athlete, athlete_cache_keys, format_handicaps, format_phenotype, get_magic_link
+from src.cache import (
+    athlete_cache,
+    athlete_cache_key,
+    guild_member_cache,
+    lookup_render_cache,
+    negative_athlete_cache,
+)
+from src.schema import LookUpAthlete
+from src.search import athlete_index, build_index
+from src.views import truncate_list
+
+
+def render_profile_fields(data: LookUpAthlete) -> list[list]:
+    """Render the athlete and ZRacing embed fields of a successful lookup as [name, value, inline] rows.
+
+    The rows only depend on the lookup data, not on who asked, so they are cached with it.
+    """
+    fields = []
+    if data.athlete is not None:
+        athlete = data.athlete.model_dump()
+        # Add all cyclist fields to the embed, excluding any null values
+        # TODO: Seems like the name is not returned because it is a property maybe
+        cyclist_fields = [
+            "name",
+            "zwift",
+            "zwiftpower",
+            "strava",
+        ]
+        # Add all cyclist fields to the embed, excluding any null values
+        logfire.info("Start adding fields to embed:")
+        for field in cyclist_fields:
+            # Format the field name to be more readable
+            logfire.info(f"Field: {field}:{athlete.get(field, 'failed to get field')}")
+            field_name = field.replace("_", " ").title()
+            fields.append([field_name, f"{athlete.get(field, '_')}", True])
+
+        #  Add zwift verified status
+        zwift_verified_status = (athlete.get("ids") or {}).get("zwift_verified", None)
+        if zwift_verified_status is not None:
+            logfire.info(f"Add zwift verified status: {athlete.get('ids')}")
+            fields.append(["Zwift Verified", str(zwift_verified_status), True])
+        else:
+            fields.append(["Zwift Status", "Not Verified", True])
+        logfire.info("Finished adding Cyclist fields to embed")
+
+    # Add ZR record
+    if data.zracing is not None:
+        zr_record = data.zracing.model_dump()
+        logfire.info("Add ZR record")
+        try:
+            zr_record["Handicaps"] = format_handicaps(zr_record)
+            zr_record["Phenotype"] = format_phenotype(zr_record)
+
+            zr_fields = [
+                "zpCategory",
+                "zpFTP",
+                "CP",
+                "AWC",
+                "compoundScore",
+                "powerRating",
+                "Handicaps",
+                "Phenotype",
+            ]
+
+            # Embed the fields
+            logfire.info(f"Add ZR record: {zr_record}")
+            fields.extend([field.title(), str(zr_record.get(field)), True] for field in zr_fields)
+        except Exception as e:
+            logfire.info(f"zr_rocord might be none: {zr_record}")
+            logfire.error(f"Error formatting ZR record: {e!s}")
+            # fields.append(["ZR Record", "Error formatting ZR record", True])
+    return fields
+
+
+def guild_member_filter(guild: discord.Guild) -> Callable[[int], bool]:
+    """Whether an indexed Zwift ID belongs to a member of ``guild``.
+
+    Uses the gateway member cache, or on an HTTP worker the member list the last roster fetch got over REST.
+    """
+    fetched = guild_member_cache.get(guild.id) or frozenset()
+
+    def include(zwift_id: int) -> bool:
+        discord_id = athlete_index.discord_ids.get(zwift_id)
+        return discord_id is not None and (discord_id in fetched or guild.get_member(discord_id) is not None)
+
+    return include
+
+
+def athlete_choices(guild: discord.Guild | None, query: str, value) -> list[discord.OptionChoice]:
+    """Suggestions among the guild's members, ``value`` turns (zwift_id, name) into the option's value."""
+    if guild is None:
+        return []
+    return [
+        discord.OptionChoice(name=f"{name} ({zwift_id})"[:100], value=value(zwift_id, name))
+        for zwift_id, name in athlete_index.search(query, include=guild_member_filter(guild))
+    ]
+
+
+async def zwift_id_autocomplete(ctx: discord.AutocompleteContext) -> list[discord.OptionChoice]:
+    """Autocomplete for the zwift_id option, served from the in-memory index, never from the API."""
+    return athlete_choices(ctx.interaction.guild, str(ctx.value or ""), lambda zwift_id, _: zwift_id)
+
+
+async def name_autocomplete(ctx: discord.AutocompleteContext) -> list[discord.OptionChoice]:
+    """Autocomplete for the name option, the chosen value is the athlete's name."""
+    return athlete_choices(ctx.interaction.guild, str(ctx.value or ""), lambda _, name: name[:100])
+
+
+def render_cache_key(cache_key: tuple[str, str], data: LookUpAthlete) -> tuple[str, ...]:
+    """Lookup key plus the modified times of the lookup, an edited profile gets a new key."""
+    return (*cache_key, *(str(r.modified) if r is not None else "" for r in (data.athlete, data.zracing)))
+
+
+@tasks.loop(minutes=float(os.getenv("ATHLETE_INDEX_REFRESH_MINUTES", "10")))
+async def athlete_index_refresh():
+    """Rebuild the autocomplete index from the athlete cache, athletes whose lookups expired drop out."""
+    with logfire.span("Refresh athlete index"):
+        try:
+            # Reading and decoding the persistent store is the slow part, keep it off the event loop.
+            index = await asyncio.to_thread(lambda: build_index(athlete_cache.stored_values()))
+            for data in athlete_cache.values():
+                index.add_lookup(data)
+            athlete_index.replace(index)
+            logfire.info(f"Athlete index refreshed: {len(athlete_index)} athletes")
+        except Exception as e:
+            logfire.error(f"Failed to refresh the athlete index: {e!s}")
 
 
 class CyclistCog(commands.Cog):
@@ -42,22 +172,41 @@ class CyclistCog(commands.Cog):
         self,
         ctx,
         member: discord.Option(discord.Member, description="Select a Discord user", required=False) = None,
-        zwift_id: discord.Option(int, description="Enter a Zwift ID number", required=False) = None,
+        zwift_id: discord.Option(
+            int, description="Enter a Zwift ID number", required=False, autocomplete=zwift_id_autocomplete
+        ) = None,
+        name: discord.Option(
+            str, description="Start typing a rider's name", required=False, autocomplete=name_autocomplete
+        ) = None,
     ):
         """Look up a user in the registration database."""
         with logfire.span("CyclistCog.cyclist_lookup"):
             try:
-                if member is None and zwift_id is None:
-                    logfire.info("No user or Zwift ID number provided.")
+                given = sum(option is not None for option in (member, zwift_id, name))
+                if given == 0:
+                    logfire.info("No user, Zwift ID number or name provided.")
                     await ctx.response.send_message(
-                        "You must provide either a Discord user or a Zwift ID number.", ephemeral=True
+                        "You must provide either a Discord user, a Zwift ID number or a name.", ephemeral=True
                     )
                     return
-                elif member is not None and zwift_id is not None:
-                    logfire.info("Both user and Zwift ID number provided.")
+                elif given > 1:
+                    logfire.info("More than one of user, Zwift ID number and name provided.")
                     await ctx.response.send_message(
-                        "You must provide either a Discord user OR a Zwift ID number, not both.", ephemeral=True
+                        "You must provide either a Discord user, a Zwift ID number OR a name, not several.",
+                        ephemeral=True,
                     )
+                    return
+                if name is not None:
+                    # Must match exactly one registered member of this server, Zwift IDs go in zwift_id.
+                    if ctx.guild is not None:
+                        zwift_id = athlete_index.find(name, include=guild_member_filter(ctx.guild))
+                    if zwift_id is None:
+                        await ctx.response.send_message(
+                            f"No single registered rider named {name!r} found in this server, pick one of the "
+                            "suggestions or use zwift_id.",
+                            ephemeral=True,
+                        )
+                        return
 
                 logfire.info(f"Looking up user: {member}, {zwift_id}")
                 if member is not None:
@@ -66,20 +215,20 @@ class CyclistCog(commands.Cog):
                 else:
                     member_id = ""
 
+                # Hedged and retried lookups can take longer than Discord's 3 second response deadline.
+                await ctx.defer(ephemeral=True)
                 data = await api_lookup_athlete(discord_id=member_id, zwift_id=zwift_id)
                 logfire.info(
                     f"Success message: {data.status_code}, {data.status_message}, cyclist: {data.athlete}, zracing: {data.zracing}"
                 )
             except Exception as e:
                 logfire.error(f"Unexpected error while looking up cyclist: {e!s}")
-                await ctx.response.send_message(
-                    "An unexpected error occurred while looking up the cyclist.", ephemeral=True
-                )
+                await ctx.respond("An unexpected error occurred while looking up the cyclist.", ephemeral=True)
                 return
 
             if data.status_code != 200:
                 logfire.error(f"success message: {data.status_code}, {data.status_message}")
-                await ctx.response.send_message(data.status_message, ephemeral=True)
+                await ctx.respond(data.status_message, ephemeral=True)
             else:
                 try:
                     embed = discord.Embed(
@@ -94,77 +243,36 @@ class CyclistCog(commands.Cog):
                     if zwift_id is not None:
                         embed.add_field(name="Zwift ID", value=zwift_id)
 
-                    if data.athlete is not None:
-                        athlete = data.athlete.model_dump()
-                        # Add all cyclist fields to the embed, excluding any null values
-                        # TODO: Seems like the name is not returned because it is a property maybe
-                        fields = [
-                            "name",
-                            "zwift",
-                            "zwiftpower",
-                            "strava",
-                        ]
-                        # Add all cyclist fields to the embed, excluding any null values
-                        logfire.info("Start adding fields to embed:")
-                        for field in fields:
-                            # Format the field name to be more readable
-                            logfire.info(f"Field: {field}:{athlete.get(field, 'failed to get field')}")
-                            field_name = field.replace("_", " ").title()
-                            embed.add_field(name=field_name, value=f"{athlete.get(field, '_')}", inline=True)
-
-                        #  Add zwift verified status
-                        zwift_verified_status = athlete.get("ids", {}).get("zwift_verified", None)
-                        if zwift_verified_status is not None:
-                            logfire.info(f"Add zwift verified status: {athlete.get('ids')}")
-                            embed.add_field(name="Zwift Verified", value=athlete["zwift_verified"], inline=True)
-                        else:
-                            embed.add_field(name="Zwift Status", value="Not Verified", inline=True)
-                        logfire.info("Finished adding Cyclist fields to embed")
-
-                    # Add ZR record
-                    if data.zracing is not None:
-                        zr_record = data.zracing.model_dump()
-                        logfire.info("Add ZR record")
-                        try:
-                            zr_record["Handicaps"] = format_handicaps(zr_record)
-                            zr_record["Phenotype"] = format_phenotype(zr_record)
-
-                            zr_fields = [
-                                "zpCategory",
-                                "zpFTP",
-                                "CP",
-                                "AWC",
-                                "compoundScore",
-                                "powerRating",
-                                "Handicaps",
-                                "Phenotype",
-                            ]
-
-                            # Embed the fields
-                            logfire.info(f"Add ZR record: {zr_record}")
-                            for field in zr_fields:
-                                embed.add_field(name=field.title(), value=zr_record.get(field), inline=True)
-                        except Exception as e:
-                            logfire.info(f"zr_rocord might be none: {zr_record}")
-                            logfire.error(f"Error formatting ZR record: {e!s}")
-                            # embed.add_field(name="ZR Record", value="Error formatting ZR record", inline=True)
+                    cache_key = render_cache_key(athlete_cache_key(discord_id=member_id, zwift_id=zwift_id), data)
+                    profile_fields = lookup_render_cache.get(cache_key)
+                    if profile_fields is None:
+                        profile_fields = render_profile_fields(data)
+                        lookup_render_cache.set(cache_key, profile_fields)
+                    for field_name, value, inline in profile_fields:
+                        embed.add_field(name=field_name, value=value, inline=inline)
+
                     if member is not None:
                         logfire.info("Add roles to embed")
-                        embed.add_field(
-                            name="Roles", value=str([r.name for r in member.roles if r is not None]), inline=False
-                        )
-                    await ctx.response.send_message(embed=embed, ephemeral=True)
+                        roles = [r.name for r in member.roles if r is not None]
+                        embed.add_field(name="Roles", value=truncate_list(roles), inline=False)
+                    await ctx.respond(embed=embed, ephemeral=True)
                 except Exception as e:
                     logfire.error(f"Unexpected error while looking up cyclist: {e!s}")
-                    await ctx.response.send_message(
-                        "An unexpected error occurred while looking up the cyclist.", ephemeral=True
-                    )
+                    await ctx.respond("An unexpected error occurred while looking up the cyclist.", ephemeral=True)
 
     @discord.slash_command(name="my_profile", description="Get a link to manage your cyclist profile")
     async def my_profile(self, ctx: discord.ApplicationContext):
         """Get a link to manage your cyclist profile."""
         with logfire.span("CyclistCog: my_profile"):
             logfire.info(f"Getting profile link for {ctx.author}:{ctx.author.id}")
+            # They are probably about to register or edit their profile, don't keep serving the old lookup.
+            # Lookups by their Zwift ID return the same profile, drop those too. Rendered profiles are keyed by
+            # the modified times of the lookup and need no invalidation.
+            for key in athlete_cache_keys(ctx.author.id):
+                if negative_athlete_cache.invalidate(key):
+                    logfire.info(f"Negative cache invalidated for {key}")
+                athlete_cache.invalidate(key)
+            await ctx.defer(ephemeral=True)
             try:
                 data = await get_magic_link(
                     api="my_profile",
@@ -220,4 +328,15 @@ class CyclistCog(commands.Cog):
 
 def setup(bot):
     """Pycord calls to setup the cog."""
+    task = athlete_index_refresh.get_task()
+    if task is not None and not task.done():
+        # A failed reload rolled back to this module after teardown cancelled the refresh, restart once it stopped.
+        task.add_done_callback(lambda _: athlete_index_refresh.start())
+    else:
+        athlete_index_refresh.start()
     bot.add_cog(CyclistCog(bot))  # add the cog to the bot
+
+
+def teardown(bot):
+    """Stop the index refresh when the cog is unloaded or reloaded, the index itself is kept."""
+    athlete_index_refresh.cancel()
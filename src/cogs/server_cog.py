@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Literal
 
@@ -6,6 +7,10 @@ import logfire
 from discord.ext import commands, tasks
 from pydantic import ValidationError
 
+from src.cache import guild_fingerprint, guild_fingerprint_cache
+from src.profiling import profiled
+from src.runtime import json_dumps, json_loads
+from src.scheduler import api_scheduler, background
 from src.schema import DiscordGuildJoinUpdatePost, DiscordJoinUpdateResponse
 
 
@@ -80,23 +85,26 @@ async def guild_post_join_update(post_data: DiscordGuildJoinUpdatePost) -> bool:
     """
     with logfire.span(f"Post Guild Join, Update, ID: {post_data.guild_id}"):
         try:
-            async with aiohttp.ClientSession() as session:
+            payload = post_data.model_dump(mode="json")
+            async with aiohttp.ClientSession() as session, api_scheduler.slot() as call:
                 response = await session.post(
                     f"{os.getenv('API_URL')}/guild/join_update/",
-                    json=post_data.model_dump(mode="json"),
-                    headers={"X-API-Key": os.getenv("API_KEY")},
+                    data=json_dumps(payload),
+                    headers={"X-API-Key": os.getenv("API_KEY"), "Content-Type": "application/json"},
                 )
                 if response.status == 200:
                     logfire.info(f"Successfully registered server: {post_data.guild_name} ({post_data.guild_id})")
-                    data = await response.json()
+                    data = await response.json(loads=json_loads)
                     logfire.info(f"API Response, validating: {data}")
                     try:
                         DiscordJoinUpdateResponse.model_validate(data)
                     except ValidationError as e:
                         logfire.error(f"Failed to validate response from API: {e!s}")
                         return False
+                    guild_fingerprint_cache.set(post_data.guild_id, guild_fingerprint(payload))
                     return True
                 else:
+                    call.failed = response.status >= 500
                     error_text = await response.text()
                     logfire.error(f"Failed to register server. Status: {response.status}, Error: {error_text}")
                     return False
@@ -122,7 +130,7 @@ class GuildJoin(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_join(self, guild) -> bool:
         """Handle new guild join and send data to API."""
-        with logfire.span("SERVER: New guild join"):
+        with logfire.span("SERVER: New guild join"), background():
             post_data = await guild_build_post_data(guild, status="JOIN")
             if post_data is None:
                 return False
@@ -133,26 +141,46 @@ class GuildJoin(commands.Cog):
 @tasks.loop(hours=12)
 async def pust_guild_update(bot: commands.Bot):
     """Push guild update to API."""
-    with logfire.span("SERVER: Push guild update"):
+    with logfire.span("SERVER: Push guild update"), profiled("pust_guild_update"), background():
         try:
             guilds = bot.guilds
             for guild in guilds:
+                # Building the post data does not await, let interactions in between guilds.
+                await asyncio.sleep(0)
                 try:
                     post_data = await guild_build_post_data(guild, status="UPDATE")
                     if post_data is None:
                         logfire.error(f"Failed to build guild update data for guild: {guild.name} ({guild.id})")
                         continue
-                    else:
-                        await guild_post_join_update(post_data)
+                    fingerprint = guild_fingerprint(post_data.model_dump(mode="json"))
+                    if guild_fingerprint_cache.get(post_data.guild_id) == fingerprint:
+                        logfire.info(f"Guild unchanged since last sync, skipping: {guild.name} ({guild.id})")
+                        continue
+                    await guild_post_join_update(post_data)
                 except Exception as e:
                     logfire.error(f"Error processing a guild update: {e!s}")
 
         except Exception as e:
             logfire.error(f"Error processing ALL guild updates: {e!s}")
             return False
+        logfire.info(f"Guild sweep done, {api_scheduler.stats()}")
         return True
 
 
 def setup(bot):
-    pust_guild_update.start(bot)
+    task = pust_guild_update.get_task()
+    if task is not None and not task.done():
+        # A failed reload rolled back to this module after teardown cancelled the sweep, restart once it stopped.
+        task.add_done_callback(lambda _: pust_guild_update.start(bot))
+    else:
+        pust_guild_update.start(bot)
     bot.add_cog(GuildJoin(bot))
+
+
+def teardown(bot):
+    """Stop the guild sweep when the cog is unloaded or reloaded.
+
+    A sweep interrupted halfway is fine, the fingerprints of the guilds already posted are kept in the shared cache
+    so the sweep the reloaded module starts skips them.
+    """
+    pust_guild_update.cancel()
@@ -0,0 +1,219 @@
+"""HTTP interactions endpoint, serve slash commands from stateless workers instead of the gateway connection.
+
+With an Interactions Endpoint URL set in the Discord developer portal, Discord POSTs every interaction to that
+URL instead of sending it over the gateway. ``BOT_MODE=http`` runs the bot as such a worker: no gateway
+connection, an aiohttp server that checks the Ed25519 signature of each request and hands the interaction to
+py-cord, so the cog handlers run unchanged. Any number of workers can sit behind a load balancer, the gateway
+process keeps handling events (guild joins, the guild sweep).
+
+The first response of a handler (``ctx.respond``, ``ctx.defer``) is returned as the body of the HTTP response,
+followups go over REST as usual. Handlers that can be slow call ``ctx.defer()`` with the visibility they want.
+As a fallback a handler that has not responded within ``INTERACTIONS_RESPONSE_TIMEOUT`` is deferred on its
+behalf, ephemeral since its visibility is not known yet, and its first response then edits the deferred
+message: a public response ends up private, unlike in gateway mode. Both are logged as warnings.
+
+Workers have no gateway cache: ``ctx.guild`` is the partial guild Discord sends along with the interaction, and
+paginated views only work if the button presses reach the worker that sent the view.
+
+Signature checks need PyNaCl, ``uv sync --extra interactions``.
+"""
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import discord
+import logfire
+from aiohttp import MultipartWriter, web
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+from src.runtime import json_dumps, json_loads
+
+PING = 1
+APPLICATION_COMMAND = 2
+MESSAGE_COMPONENT = 3
+AUTOCOMPLETE = 4
+
+PONG = 1
+CHANNEL_MESSAGE = 4
+DEFERRED_CHANNEL_MESSAGE = 5
+DEFERRED_UPDATE_MESSAGE = 6
+UPDATE_MESSAGE = 7
+AUTOCOMPLETE_RESULT = 8
+EPHEMERAL = 64
+
+
+def load_verify_key(public_key: str):
+    """PyNaCl verify key for the application's public key (hex, from the developer portal)."""
+    try:
+        from nacl.signing import VerifyKey
+    except ImportError as e:
+        raise RuntimeError("BOT_MODE=http needs PyNaCl, install it with `uv sync --extra interactions`") from e
+    return VerifyKey(bytes.fromhex(public_key))
+
+
+def verify_signature(verify_key, signature: str, timestamp: str, body: bytes, max_age: float) -> bool:
+    """Check Discord's ``X-Signature-Ed25519`` over timestamp + body, and that the timestamp is recent.
+
+    The timestamp check stops a captured request from being replayed later, its signature stays valid forever.
+    """
+    from nacl.exceptions import BadSignatureError
+
+    try:
+        if abs(time.time() - int(timestamp)) > max_age:
+            return False
+        verify_key.verify(timestamp.encode() + body, bytes.fromhex(signature))
+    except (BadSignatureError, ValueError):
+        return False
+    return True
+
+
+@dataclass
+class PendingResponse:
+    """The initial response of one interaction, filled in by the handler and returned as the HTTP body."""
+
+    interaction_id: int
+    application_id: int
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+    deferred: bool = False
+
+
+_pending: ContextVar[PendingResponse | None] = ContextVar("pending_interaction_response", default=None)
+
+
+class CapturingWebhookAdapter(AsyncWebhookAdapter):
+    """Route the initial interaction response to the HTTP response instead of the callback endpoint."""
+
+    async def create_interaction_response(self, interaction_id, token, *, session, type, data=None, files=None, **kw):  # noqa: D102
+        pending = _pending.get()
+        if pending is None or pending.interaction_id != interaction_id:
+            return await super().create_interaction_response(
+                interaction_id, token, session=session, type=type, data=data, files=files, **kw
+            )
+        if not pending.future.done():
+            # Read now, py-cord closes the files as soon as this returns.
+            attachments = [(f.filename, f.fp.read(), f.description) for f in files or []]
+            pending.future.set_result((type, data, attachments))
+            return None
+        if pending.deferred and type in (CHANNEL_MESSAGE, UPDATE_MESSAGE):
+            # Deferred on the handler's behalf, its response becomes an edit of the deferred message.
+            if type == CHANNEL_MESSAGE and not (data or {}).get("flags", 0) & EPHEMERAL:
+                logfire.warn(f"Public response to interaction {interaction_id} sent as an edit of an ephemeral defer")
+            payload, multipart = _edit_parameters(data, files)
+            return await self.edit_original_interaction_response(
+                pending.application_id, token, session=session, payload=payload, multipart=multipart, files=files, **kw
+            )
+        return None
+
+
+def _edit_parameters(data: dict | None, files: list[discord.File] | None) -> tuple[dict | None, list | None]:
+    """(payload, multipart) of a message edit, the files go in a form next to the JSON as py-cord sends them."""
+    if not files:
+        return data, None
+    payload = {
+        **(data or {}),
+        "attachments": [{"id": i, "filename": f.filename, "description": f.description} for i, f in enumerate(files)],
+    }
+    multipart = [{"name": "payload_json", "value": json_dumps(payload).decode()}]
+    multipart += [
+        {"name": f"files[{i}]", "value": f.fp, "filename": f.filename, "content_type": "application/octet-stream"}
+        for i, f in enumerate(files)
+    ]
+    return None, multipart
+
+
+def _response_body(type_: int, data: dict | None, attachments: list) -> web.Response:
+    payload = {"type": type_, **({"data": data} if data is not None else {})}
+    if not attachments:
+        return web.Response(body=json_dumps(payload), content_type="application/json")
+    payload.setdefault("data", {})["attachments"] = [
+        {"id": i, "filename": filename, "description": description}
+        for i, (filename, _, description) in enumerate(attachments)
+    ]
+    writer = MultipartWriter("form-data")
+    writer.append(json_dumps(payload), {"Content-Type": "application/json"}).set_content_disposition(
+        "form-data", name="payload_json"
+    )
+    for i, (filename, content, _) in enumerate(attachments):
+        writer.append(content, {"Content-Type": "application/octet-stream"}).set_content_disposition(
+            "form-data", name=f"files[{i}]", filename=filename
+        )
+    return web.Response(body=writer)
+
+
+def create_app(bot: discord.Bot, public_key: str) -> web.Application:
+    """Build the aiohttp app with the interactions endpoint and a health check for the load balancer."""
+    verify_key = load_verify_key(public_key)
+    adapter = CapturingWebhookAdapter()
+    timeout = float(os.getenv("INTERACTIONS_RESPONSE_TIMEOUT", "2.5"))
+    max_age = float(os.getenv("INTERACTIONS_MAX_CLOCK_SKEW", "5"))
+
+    async def interactions(request: web.Request) -> web.Response:
+        body = await request.read()
+        signature = request.headers.get("X-Signature-Ed25519", "")
+        timestamp = request.headers.get("X-Signature-Timestamp", "")
+        if not verify_signature(verify_key, signature, timestamp, body, max_age):
+            logfire.warn("Rejected interaction with an invalid signature or a stale timestamp")
+            return web.Response(status=401, text="invalid request signature")
+
+        data = json_loads(body)
+        if data["type"] == PING:
+            return web.json_response({"type": PONG})
+
+        pending = PendingResponse(int(data["id"]), int(data["application_id"]))
+        # Tasks py-cord starts for the handlers copy this context, so they see the adapter and the pending response.
+        async_context.set(adapter)
+        _pending.set(pending)
+        bot._connection.parse_interaction_create(data)
+        try:
+            type_, response_data, attachments = await asyncio.wait_for(asyncio.shield(pending.future), timeout)
+        except TimeoutError:
+            pending.deferred = True
+            if data["type"] == AUTOCOMPLETE:
+                logfire.warn(f"Autocomplete {data['id']} did not answer within {timeout}s")
+                return web.json_response({"type": AUTOCOMPLETE_RESULT, "data": {"choices": []}})
+            logfire.warn(
+                f"Interaction {data['id']} did not respond within {timeout}s, deferring it as ephemeral, "
+                "slow commands should call ctx.defer() themselves"
+            )
+            pending.future.cancel()
+            if data["type"] == MESSAGE_COMPONENT:
+                return web.json_response({"type": DEFERRED_UPDATE_MESSAGE})
+            return web.json_response({"type": DEFERRED_CHANNEL_MESSAGE, "data": {"flags": EPHEMERAL}})
+        return _response_body(type_, response_data, attachments)
+
+    async def health(_request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "user": str(bot.user)})
+
+    app = web.Application()
+    app.router.add_post(os.getenv("INTERACTIONS_PATH", "/interactions"), interactions)
+    app.router.add_get("/health", health)
+    return app
+
+
+def run_interactions_server(bot: discord.Bot, token: str) -> None:
+    """Log in over REST and serve interactions until interrupted, no gateway connection is made."""
+    public_key = os.getenv("DISCORD_PUBLIC_KEY", "")
+    if not public_key:
+        raise ValueError("BOT_MODE=http needs DISCORD_PUBLIC_KEY, the application's public key")
+    host = os.getenv("INTERACTIONS_HOST", "0.0.0.0")
+    port = int(os.getenv("INTERACTIONS_PORT", "8080"))
+
+    async def serve():
+        await bot.login(token)
+        runner = web.AppRunner(create_app(bot, public_key))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logfire.info(f"Serving interactions on http://{host}:{port} as {bot.user}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+            await bot.close()
+
+    try:
+        bot.loop.run_until_complete(serve())
+    except KeyboardInterrupt:
+        logfire.info("Interactions server stopped")
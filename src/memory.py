@@ -0,0 +1,136 @@
+"""Memory watchdog: RSS and object counts over time, tracemalloc snapshots diffed on demand or over a threshold."""
+
+import asyncio
+import gc
+import os
+import resource
+import time
+import tracemalloc
+from collections import Counter
+
+import discord
+import logfire
+from discord.ext import tasks
+
+from src.cache import CACHES
+from src.views import live_view_count
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> int:
+    """Return the current resident set size, falls back to the peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def object_counts(bot: discord.Bot) -> dict[str, int]:
+    """Count the things that make up most of the bot's memory, cheap enough for every watchdog tick."""
+    counts = {
+        "guilds": len(bot.guilds),
+        "members": sum(len(g.members) for g in bot.guilds),
+        "users": len(bot.users),
+        "paginated_views": live_view_count(),
+    }
+    counts.update({f"cache_{name}": len(cache) for name, cache in CACHES.items()})
+    return counts
+
+
+def gc_object_count() -> int:
+    """Objects tracked by the gc, walks all of them so run it in a thread, see the /memory command."""
+    return len(gc.get_objects())
+
+
+def instance_counts(type_names: tuple[str, ...] = ("AsyncClient", "ClientSession", "View", "Member")) -> dict[str, int]:
+    """Live instances per class name, walks every gc tracked object so only run with snapshots."""
+    counts = Counter(type(o).__name__ for o in gc.get_objects())
+    return {name: counts[name] for name in type_names}
+
+
+class MemoryWatchdog:
+    """Keeps the last tracemalloc snapshot so each new one is diffed against it.
+
+    tracemalloc is only started with the first snapshot (or at startup with MEMORY_TRACEMALLOC), the first
+    snapshot after that is the baseline.
+    """
+
+    def __init__(self, threshold_mb: float, cooldown: float, top_n: int, frames: int):
+        self.threshold_mb = threshold_mb
+        self.cooldown = cooldown
+        self.top_n = top_n
+        self.frames = frames
+        self.previous: tracemalloc.Snapshot | None = None
+        self.previous_at = 0.0
+        self.last_rss = 0
+        self.peak_rss = 0
+
+    def start_tracing(self) -> None:  # noqa: D102
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logfire.info(f"tracemalloc started, {self.frames} frames")
+
+    def _snapshot_diff(self) -> tuple[tracemalloc.Snapshot, list[tracemalloc.StatisticDiff]]:
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        if self.previous is None:
+            return snapshot, []
+        return snapshot, snapshot.compare_to(self.previous, "lineno")[: self.top_n]
+
+    async def snapshot(self, reason: str) -> list[str]:
+        """Take a snapshot, diff it against the previous one and report the top growing allocation sites."""
+        with logfire.span(f"Memory snapshot: {reason}"):
+            if not tracemalloc.is_tracing():
+                self.start_tracing()
+                self.previous = None
+            snapshot, diff = await asyncio.to_thread(self._snapshot_diff)
+            since = time.monotonic() - self.previous_at if self.previous is not None else 0.0
+            self.previous, self.previous_at = snapshot, time.monotonic()
+            if not diff:
+                logfire.info("Memory baseline snapshot taken, the next snapshot is diffed against it")
+                return []
+            lines = [
+                f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+7d} blocks  {stat.traceback[0]}"
+                for stat in diff
+                if stat.size_diff > 0
+            ]
+            logfire.warn(
+                f"Top growing allocation sites over {since:.0f}s ({reason})",
+                sites=lines,
+                instances=await asyncio.to_thread(instance_counts),
+            )
+            return lines
+
+    async def check(self, bot: discord.Bot) -> None:
+        """Log RSS and object counts, snapshot if RSS is over the threshold."""
+        rss = rss_bytes()
+        self.last_rss = rss
+        self.peak_rss = max(self.peak_rss, rss)
+        counts = object_counts(bot)
+        logfire.info(f"Memory: RSS {rss / 2**20:.1f} MiB", rss=rss, peak_rss=self.peak_rss, **counts)
+        over = self.threshold_mb and rss > self.threshold_mb * 2**20
+        if over and time.monotonic() - self.previous_at > self.cooldown:
+            await self.snapshot(f"RSS {rss / 2**20:.0f} MiB over {self.threshold_mb} MiB")
+
+
+watchdog = MemoryWatchdog(
+    threshold_mb=float(os.getenv("MEMORY_THRESHOLD_MB", "0")),
+    cooldown=float(os.getenv("MEMORY_SNAPSHOT_COOLDOWN", "3600")),
+    top_n=int(os.getenv("MEMORY_TOP_N", "15")),
+    frames=int(os.getenv("MEMORY_TRACE_FRAMES", "1")),
+)
+
+
+@tasks.loop(minutes=float(os.getenv("MEMORY_CHECK_MINUTES", "5")))
+async def memory_watchdog(bot: discord.Bot):
+    """Periodic memory check."""
+    try:
+        await watchdog.check(bot)
+    except Exception as e:
+        logfire.error(f"Memory watchdog failed: {e!s}")
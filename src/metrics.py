@@ -0,0 +1,60 @@
+"""Rider metric tables and per-rider extraction, without numpy.
+
+The cogs build their command choices and labels from these at load time. The array code that ranks and compares
+riders is in ``src/stats.py``, which imports numpy and is only loaded once such a command runs.
+"""
+
+import math
+
+from src.schema import ZRacing
+
+# key: (label, format of a value)
+METRICS: dict[str, tuple[str, str]] = {
+    "ftp": ("FTP", "{:.0f} W"),
+    "wkg": ("FTP w/kg", "{:.2f} w/kg"),
+    "compound_score": ("Compound Score", "{:.0f}"),
+    "power_rating": ("Power Rating", "{:.0f}"),
+    "race_rating": ("Race Rating", "{:.0f}"),
+    "flat": ("Handicap Flat", "{:.2f}"),
+    "rolling": ("Handicap Rolling", "{:.2f}"),
+    "hilly": ("Handicap Hilly", "{:.2f}"),
+    "mountainous": ("Handicap Mountainous", "{:.2f}"),
+}
+METRIC_INDEX = {key: i for i, key in enumerate(METRICS)}
+
+POWER_DURATIONS = (5, 15, 30, 60, 120, 300, 1200)
+TERRAINS = ("flat", "rolling", "hilly", "mountainous")
+
+
+def number(value) -> float:
+    """``value`` as a float, NaN if it is missing or not a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def metric_row(zr_record: ZRacing) -> list[float]:
+    """Extract every metric of a rider in METRICS order, NaN where the record has no value."""
+    power = zr_record.power or {}
+    extra = zr_record.model_extra or {}
+    profile = (zr_record.handicaps or {}).get("profile") or {}
+    current = (zr_record.race or {}).get("current") or {}
+    ftp = number(zr_record.zpFTP)
+    weight = number(zr_record.weight)
+    return [
+        ftp,
+        ftp / weight if weight > 0 else math.nan,
+        number(power.get("compoundScore", extra.get("compoundScore"))),
+        number(power.get("powerRating", extra.get("powerRating"))),
+        number(current.get("rating")),
+        number(profile.get("flat")),
+        number(profile.get("rolling")),
+        number(profile.get("hilly")),
+        number(profile.get("mountainous")),
+    ]
+
+
+def duration_label(seconds: int) -> str:
+    """5 -> '5s', 300 -> '5m'."""
+    return f"{seconds // 60}m" if seconds >= 60 else f"{seconds}s"
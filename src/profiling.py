@@ -0,0 +1,206 @@
+"""On-demand sampling profiler, armed from the owner-only ``/profile`` command.
+
+Nothing runs while profiling is off: the sampler thread only exists during a session, command hooks are bot
+listeners that are added when a session is armed and removed when it ends, and the guild sweep checks a dict.
+Reports are collapsed stacks (``frame;frame;frame count`` per line), readable by flamegraph.pl or speedscope.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+
+import discord
+import logfire
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread every ``interval`` seconds from a daemon thread.
+
+    The bot is single threaded, so sampling the event loop thread sees every coroutine that runs while the
+    profiler is on, including other commands that happen to run concurrently.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._started = 0.0
+
+    @property
+    def running(self) -> bool:  # noqa: D102
+        return self._thread is not None
+
+    def start(self, thread_id: int | None = None) -> None:
+        """Start sampling ``thread_id``, the calling thread by default."""
+        if self._thread is not None:
+            return
+        target = threading.get_ident() if thread_id is None else thread_id
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, args=(target,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling, samples are kept so a profiler can be started and stopped several times."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed += time.perf_counter() - self._started
+
+    def _run(self, thread_id: int) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_qualname}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, most frequent first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, n: int = 10) -> list[tuple[str, float]]:
+        """Leaf frames with their share of samples."""
+        leaves: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [(leaf, count / self.samples) for leaf, count in leaves.most_common(n)] if self.samples else []
+
+
+class ProfileSession:
+    """Profile the next ``invocations`` runs of ``target``, or everything for a time window if target is None."""
+
+    def __init__(self, target: str | None, invocations: int, interval: float):
+        self.target = target
+        self.remaining = invocations
+        self.profiler = SamplingProfiler(interval)
+        self.done = asyncio.Event()
+        self.started_at = datetime.now(UTC)
+        self.remove_hooks: Callable[[], None] | None = None
+
+    def begin(self) -> None:  # noqa: D102
+        self.profiler.start()
+
+    def end(self) -> None:
+        """One profiled invocation finished."""
+        self.profiler.stop()
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.done.set()
+
+    def report(self) -> str:
+        """Report header followed by the collapsed stacks."""
+        header = [
+            f"# target: {self.target or 'window'}",
+            f"# started: {self.started_at.isoformat()}",
+            f"# samples: {self.profiler.samples}, sampled time: {self.profiler.elapsed:.3f}s",
+            f"# interval: {self.profiler.interval}s",
+        ]
+        return "\n".join(header) + "\n" + self.profiler.collapsed() + "\n"
+
+    def write(self) -> Path:
+        """Write the report to PROFILE_DIR."""
+        directory = Path(os.getenv("PROFILE_DIR", "profiles"))
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = self.started_at.strftime("%Y%m%dT%H%M%S")
+        path = directory / f"profile-{self.target or 'window'}-{stamp}.txt"
+        path.write_text(self.report())
+        logfire.info(f"Profile written: {path}, top: {self.profiler.top_functions(5)}")
+        return path
+
+
+# target -> armed session, checked by the hooks below.
+ARMED: dict[str, ProfileSession] = {}
+
+
+@contextmanager
+def profiled(target: str):
+    """Profile this block if a session is armed for ``target``, used by background jobs like the guild sweep."""
+    session = ARMED.get(target)
+    if session is None:
+        yield
+        return
+    session.begin()
+    try:
+        yield
+    finally:
+        session.end()
+
+
+def _arm_command_hooks(bot: discord.Bot, session: ProfileSession) -> None:
+    running: set[int] = set()
+
+    async def on_application_command(ctx: discord.ApplicationContext):
+        if ctx.command.qualified_name == session.target and not session.profiler.running:
+            running.add(ctx.interaction.id)
+            session.begin()
+
+    async def on_application_command_finished(ctx: discord.ApplicationContext, *_args):
+        if ctx.interaction.id in running:
+            running.discard(ctx.interaction.id)
+            session.end()
+
+    bot.add_listener(on_application_command, "on_application_command")
+    bot.add_listener(on_application_command_finished, "on_application_command_completion")
+    bot.add_listener(on_application_command_finished, "on_application_command_error")
+
+    def remove_hooks():
+        bot.remove_listener(on_application_command, "on_application_command")
+        bot.remove_listener(on_application_command_finished, "on_application_command_completion")
+        bot.remove_listener(on_application_command_finished, "on_application_command_error")
+
+    session.remove_hooks = remove_hooks
+
+
+async def run_session(
+    bot: discord.Bot,
+    target: str | None,
+    seconds: float,
+    invocations: int,
+    trigger: Callable[[], Awaitable] | None = None,
+) -> ProfileSession:
+    """Profile ``target`` for its next invocations, or the whole loop for ``seconds`` if target is None.
+
+    Per-invocation sessions give up after ``seconds`` if the target did not run often enough. ``trigger`` is
+    started once the session is armed, for targets that would otherwise not run in time.
+    """
+    session = ProfileSession(target, invocations, float(os.getenv("PROFILE_INTERVAL", "0.005")))
+    if target is None:
+        session.begin()
+        await asyncio.sleep(seconds)
+        session.end()
+        return session
+
+    if target in ARMED:
+        raise ValueError(f"A profiling session is already armed for {target}")
+    ARMED[target] = session
+    if target != "pust_guild_update":
+        _arm_command_hooks(bot, session)
+    triggered = asyncio.create_task(trigger()) if trigger is not None else None
+    try:
+        await asyncio.wait_for(session.done.wait(), timeout=seconds)
+    except TimeoutError:
+        logfire.info(f"Profiling {target}: timed out with {session.remaining} invocations left")
+    finally:
+        ARMED.pop(target, None)
+        if session.remove_hooks is not None:
+            session.remove_hooks()
+        session.profiler.stop()
+    if triggered is not None:
+        await triggered
+    return session
@@ -0,0 +1,176 @@
+"""Compact athlete records for keeping many athletes in memory.
+
+``Cyclist`` and ``ZRacing`` keep every key the API sends, nested dicts included, which costs several KB per
+athlete. These records keep only what the bot shows or ranks: scalars in slots, repeated short strings
+interned, and the power, handicap and phenotype numbers in one fixed-layout ``array('f')`` (float32, NaN where
+missing). Converting back gives valid pydantic models with the nested dicts rebuilt in the shape the cogs and
+``src/stats.py`` read them, unknown extras are gone.
+
+``uv run benchmarks/bench_records.py`` reports the bytes per record of both representations.
+"""
+
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from uuid import UUID
+
+from src.metrics import POWER_DURATIONS, TERRAINS, number
+from src.schema import Cyclist, ZRacing
+
+POWER_KEYS = (
+    *(f"wkg{s}" for s in POWER_DURATIONS),
+    *(f"w{s}" for s in POWER_DURATIONS),
+    "CP",
+    "AWC",
+    "compoundScore",
+    "powerRating",
+)
+PHENOTYPE_SCORES = ("sprinter", "puncheur", "pursuiter", "climber", "tt")
+
+# Offsets into ZRacingRecord.values.
+POWER = {key: i for i, key in enumerate(POWER_KEYS)}
+HANDICAP = {terrain: len(POWER_KEYS) + i for i, terrain in enumerate(TERRAINS)}
+PHENOTYPE = {score: len(POWER_KEYS) + len(TERRAINS) + i for i, score in enumerate(PHENOTYPE_SCORES)}
+RACE_RATING = len(POWER_KEYS) + len(TERRAINS) + len(PHENOTYPE_SCORES)
+PHENOTYPE_BIAS = RACE_RATING + 1
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if value is not None else None
+
+
+def _present(value: float) -> float | None:
+    return None if value != value else value
+
+
+@dataclass(slots=True)
+class ZRacingRecord:
+    """The displayed and ranked fields of a ``ZRacing`` record."""
+
+    rider_id: int
+    name: str
+    gender: str
+    country: str
+    category: str
+    ftp: int
+    height: float
+    weight: float
+    phenotype: str | None
+    uuid: int
+    created: float
+    modified: float
+    values: array
+
+    @classmethod
+    def from_model(cls, zr: ZRacing) -> "ZRacingRecord":
+        """Keep what the bot uses, power and score fields missing from ``power`` are looked up in the extras."""
+        power = zr.power or {}
+        extra = zr.model_extra or {}
+        profile = (zr.handicaps or {}).get("profile") or {}
+        phenotype = zr.phenotype or {}
+        scores = phenotype.get("scores") or {}
+        current = (zr.race or {}).get("current") or {}
+        values = array("f", [number(power.get(key, extra.get(key))) for key in POWER_KEYS])
+        values.extend(number(profile.get(terrain)) for terrain in TERRAINS)
+        values.extend(number(scores.get(score)) for score in PHENOTYPE_SCORES)
+        values.append(number(current.get("rating")))
+        values.append(number(phenotype.get("bias")))
+        return cls(
+            rider_id=zr.riderId,
+            name=zr.name,
+            gender=_intern(zr.gender),
+            country=_intern(zr.country),
+            category=_intern(zr.zpCategory),
+            ftp=zr.zpFTP,
+            height=zr.height,
+            weight=zr.weight,
+            phenotype=_intern(phenotype.get("value")),
+            uuid=zr.uuid.int,
+            created=zr.created.timestamp(),
+            modified=zr.modified.timestamp(),
+            values=values,
+        )
+
+    def power(self, key: str) -> float:
+        """Value of one of ``POWER_KEYS``, NaN if the record had none."""
+        return self.values[POWER[key]]
+
+    def handicap(self, terrain: str) -> float:
+        """Handicap for one of ``TERRAINS``, NaN if the record had none."""
+        return self.values[HANDICAP[terrain]]
+
+    @property
+    def race_rating(self) -> float:  # noqa: D102
+        return self.values[RACE_RATING]
+
+    def to_model(self) -> ZRacing:
+        """Rebuild a ``ZRacing`` model, nested dicts hold only the kept values, in float32 precision."""
+        values = self.values
+        scores = {score: _present(values[i]) for score, i in PHENOTYPE.items()}
+        return ZRacing(
+            uuid=UUID(int=self.uuid),
+            riderId=self.rider_id,
+            name=self.name,
+            gender=self.gender,
+            country=self.country,
+            height=self.height,
+            weight=self.weight,
+            zpCategory=self.category,
+            zpFTP=self.ftp,
+            power={key: values[i] for key, i in POWER.items() if values[i] == values[i]},
+            race={"current": {"rating": _present(values[RACE_RATING])}},
+            handicaps={"profile": {terrain: values[i] for terrain, i in HANDICAP.items() if values[i] == values[i]}},
+            phenotype={"scores": scores, "value": self.phenotype, "bias": _present(values[PHENOTYPE_BIAS])},
+            created=datetime.fromtimestamp(self.created, UTC),
+            modified=datetime.fromtimestamp(self.modified, UTC),
+        )
+
+
+@dataclass(slots=True)
+class CyclistRecord:
+    """The displayed fields of a ``Cyclist``, of ``ids`` only the Zwift verification is kept."""
+
+    first_name: str
+    last_name: str
+    zwift_id: int
+    discord_id: int
+    strava_id: int | None
+    usac_id: int | None
+    uci_id: int | None
+    zwift_verified: bool | None
+    created: float
+    modified: float
+
+    @classmethod
+    def from_model(cls, cyclist: Cyclist) -> "CyclistRecord":  # noqa: D102
+        return cls(
+            first_name=cyclist.first_name,
+            last_name=cyclist.last_name,
+            zwift_id=cyclist.zwift_id,
+            discord_id=cyclist.discord_id,
+            strava_id=cyclist.strava_id,
+            usac_id=cyclist.usac_id,
+            uci_id=cyclist.uci_id,
+            zwift_verified=(cyclist.ids or {}).get("zwift_verified"),
+            created=cyclist.created.timestamp(),
+            modified=cyclist.modified.timestamp(),
+        )
+
+    @property
+    def name(self) -> str:  # noqa: D102
+        return f"{self.first_name} {self.last_name}"
+
+    def to_model(self) -> Cyclist:  # noqa: D102
+        return Cyclist(
+            first_name=self.first_name,
+            last_name=self.last_name,
+            usac_id=self.usac_id,
+            uci_id=self.uci_id,
+            zwift_id=self.zwift_id,
+            strava_id=self.strava_id,
+            discord_id=self.discord_id,
+            ids={"zwift_verified": self.zwift_verified} if self.zwift_verified is not None else None,
+            created=datetime.fromtimestamp(self.created, UTC),
+            modified=datetime.fromtimestamp(self.modified, UTC),
+        )
@@ -0,0 +1,164 @@
+"""Shared HTTP client and the retry/hedging policy for read-only API calls."""
+
+import asyncio
+import os
+import random
+import time
+
+import httpx
+import logfire
+
+from src.scheduler import api_scheduler
+
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Process wide client so connections to the API are pooled instead of opened per request."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=float(os.getenv("API_TIMEOUT", "10")))
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client, a new one is created on next use."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class RetryBudget:
+    """Token bucket limiting retries and hedges to a fraction of regular requests.
+
+    Every request adds ``ratio`` tokens, every retry or hedge spends one. When the API is down the bucket drains
+    and extra attempts stop, so the bot does not multiply the load on a struggling server.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.spent = 0
+        self.denied = 0
+
+    def deposit(self) -> None:  # noqa: D102
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend a token, returns False if the budget is exhausted."""
+        if self.tokens < 1:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        self.spent += 1
+        return True
+
+
+class RequestPolicy:
+    """Hedged, retried GET requests for idempotent endpoints.
+
+    - hedge: if no response after ``hedge_delay`` seconds a duplicate request is sent and the first answer wins,
+      a 502/503/504 only if the other attempt fails too.
+    - retry: transport errors and 502/503/504 are retried up to ``max_attempts`` with capped exponential backoff
+      and full jitter.
+    - both draw from the same RetryBudget.
+    - every attempt takes an ``api_scheduler`` slot of the caller's priority, backoff sleeps do not hold one.
+    """
+
+    def __init__(
+        self,
+        hedge_delay: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_cap: float,
+        budget: RetryBudget,
+    ):
+        self.hedge_delay = hedge_delay
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.budget = budget
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET ``url`` with hedging and retries, raises the last httpx.TransportError if every attempt failed."""
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            response: httpx.Response | None = None
+            error: httpx.TransportError | None = None
+            try:
+                async with api_scheduler.slot() as call:
+                    response = await self._hedged_get(url, **kwargs)
+                    call.failed = response.status_code >= 500
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                logfire.warn(f"Retryable status {response.status_code} from {url}, attempt {attempt}")
+            except httpx.TransportError as e:
+                error = e
+                logfire.warn(f"Request to {url} failed, attempt {attempt}: {e!r}")
+            if attempt >= self.max_attempts or not self.budget.withdraw():
+                if response is not None:
+                    return response
+                raise error
+            self.retries += 1
+            await asyncio.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))))
+            attempt += 1
+
+    async def _hedged_get(self, url: str, **kwargs) -> httpx.Response:
+        client = get_client()
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(client.get(url, **kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done and self.budget.withdraw():
+                self.hedges += 1
+                logfire.info(f"Hedging request to {url} after {self.hedge_delay}s")
+                tasks.append(asyncio.create_task(client.get(url, **kwargs)))
+            pending = set(tasks)
+            error: BaseException | None = None
+            retryable: httpx.Response | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif task.result().status_code in RETRY_STATUS_CODES:
+                        # The other attempt may still succeed, only settle for a 5xx if it does not.
+                        retryable = task.result()
+                    else:
+                        if task is not tasks[0]:
+                            self.hedge_wins += 1
+                        logfire.info(f"GET {url}: {time.perf_counter() - start:.3f}s, {len(tasks)} request(s)")
+                        return task.result()
+            if retryable is not None:
+                return retryable
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict[str, int | float]:
+        """Counters for logging."""
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "budget_tokens": round(self.budget.tokens, 2),
+            "budget_denied": self.budget.denied,
+        }
+
+
+read_policy = RequestPolicy(
+    hedge_delay=float(os.getenv("HEDGE_DELAY", "1.0")),
+    max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+    backoff_base=float(os.getenv("RETRY_BACKOFF_BASE", "0.2")),
+    backoff_cap=float(os.getenv("RETRY_BACKOFF_CAP", "2.0")),
+    budget=RetryBudget(ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")), max_tokens=10),
+)
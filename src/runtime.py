@@ -0,0 +1,74 @@
+"""Runtime selection: event loop policy and JSON codec.
+
+The performance mode is opt-in through ``PERFORMANCE_MODE`` in ``Settings``. When enabled the bot runs on
+``uvloop`` and encodes/decodes JSON with ``msgspec`` (the same codec py-cord uses internally when it is
+installed). Either library falling back to the stdlib is silent apart from a log line.
+
+It stays off by default: on ``benchmarks/bench_runtime.py`` it is not faster than asyncio and the stdlib
+codec, the lookups and guild sync it measures wait on the API, not on the loop or on JSON. Measure before
+turning it on.
+"""
+
+import asyncio
+import json
+import os
+from collections.abc import Callable
+from typing import Any
+
+import logfire
+
+
+def performance_mode() -> bool:
+    """Return True if the performance runtime mode is enabled in the environment."""
+    return os.getenv("PERFORMANCE_MODE", "False").lower() in ("true", "1", "yes")
+
+
+def install_event_loop() -> str:
+    """Install the fastest available event loop policy.
+
+    Must be called before the bot is constructed, py-cord grabs the loop in ``Client.__init__``.
+
+    Returns:
+        str: Name of the event loop implementation in use.
+
+    """
+    if not performance_mode():
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        logfire.warn("PERFORMANCE_MODE: uvloop not installed, using the asyncio event loop")
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+def _stdlib_codec() -> tuple[str, Callable[[str | bytes], Any], Callable[[Any], bytes]]:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    return "json", json.loads, dumps
+
+
+def _select_codec() -> tuple[str, Callable[[str | bytes], Any], Callable[[Any], bytes]]:
+    if not performance_mode():
+        return _stdlib_codec()
+    try:
+        import msgspec
+    except ImportError:
+        logfire.warn("PERFORMANCE_MODE: msgspec not installed, using the stdlib json codec")
+        return _stdlib_codec()
+    return "msgspec", msgspec.json.decode, msgspec.json.encode
+
+
+JSON_CODEC, json_loads, json_dumps = _select_codec()
+
+
+def runtime_info() -> dict[str, str]:
+    """Describe the active runtime, used in logs and the about command."""
+    policy = type(asyncio.get_event_loop_policy()).__module__.split(".")[0]
+    return {
+        "performance_mode": str(performance_mode()),
+        "event_loop": "uvloop" if policy == "uvloop" else "asyncio",
+        "json_codec": JSON_CODEC,
+    }
@@ -0,0 +1,184 @@
+"""Priority scheduling of API calls, interactive commands first and background sync with what is left.
+
+Every call to ``API_URL`` takes a slot from ``api_scheduler``. Calls are interactive unless made inside
+``background()``, which the guild sweep, guild join posts and roster bulk lookups use. The two classes have
+separate concurrency limits and a queued interactive call is always started before a queued background call.
+
+The background limit adapts (AIMD): it grows by about one slot per limit's worth of successful background calls
+and is halved, at most once per ``API_DECREASE_INTERVAL``, while the recent interactive latency is above
+``API_LATENCY_TARGET`` or the API error rate is above ``API_MAX_ERROR_RATE``. Time spent queued is tracked per
+class, see ``stats()``.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+import logfire
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Seconds an interactive latency sample counts towards backing off background work.
+INTERACTIVE_WINDOW = 30.0
+SMOOTHING = 0.2
+
+_priority: ContextVar[str] = ContextVar("api_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Run the API calls made in this block, and in tasks started from it, as background calls."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class Call:
+    """Outcome of one scheduled call, set ``failed`` for error responses, exceptions count as failures."""
+
+    def __init__(self):
+        self.failed = False
+
+
+class ApiScheduler:
+    """Admit API calls by priority class, with a background limit that backs off under interactive load."""
+
+    def __init__(
+        self,
+        interactive_limit: int,
+        background_limit: int,
+        background_min: int,
+        latency_target: float,
+        max_error_rate: float,
+        decrease_interval: float,
+    ):
+        self.interactive_limit = interactive_limit
+        self.background_max = background_limit
+        self.background_min = background_min
+        self.background_limit = float(background_limit)
+        self.latency_target = latency_target
+        self.max_error_rate = max_error_rate
+        self.decrease_interval = decrease_interval
+        self.in_flight = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.waiters: dict[str, deque[asyncio.Future]] = {INTERACTIVE: deque(), BACKGROUND: deque()}
+        self.waits = {cls: {"calls": 0, "queued": 0, "total": 0.0, "max": 0.0} for cls in (INTERACTIVE, BACKGROUND)}
+        self.interactive_latency = 0.0
+        self.error_rate = 0.0
+        self.decreases = 0
+        self._last_interactive = -INTERACTIVE_WINDOW
+        self._last_decrease = -decrease_interval
+
+    @asynccontextmanager
+    async def slot(self, priority: str | None = None) -> AsyncIterator[Call]:
+        """Hold a slot of ``priority`` (the ``background()`` context by default) for the duration of one call."""
+        priority = priority or _priority.get()
+        await self._acquire(priority)
+        call = Call()
+        start = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            call.failed = True
+            raise
+        finally:
+            self._release(priority)
+            self._record(priority, time.perf_counter() - start, call.failed)
+
+    def _limit(self, priority: str) -> int:
+        return int(self.background_limit) if priority == BACKGROUND else self.interactive_limit
+
+    def _can_start(self, priority: str) -> bool:
+        if self.waiters[INTERACTIVE] or self.in_flight[priority] >= self._limit(priority):
+            return False
+        return priority == INTERACTIVE or not self.waiters[BACKGROUND]
+
+    async def _acquire(self, priority: str) -> None:
+        waits = self.waits[priority]
+        waits["calls"] += 1
+        if self._can_start(priority):
+            self.in_flight[priority] += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(future)
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted and cancelled in the same tick, hand the slot on.
+                self._release(priority)
+            elif future in self.waiters[priority]:
+                self.waiters[priority].remove(future)
+            raise
+        wait = time.perf_counter() - start
+        waits["queued"] += 1
+        waits["total"] += wait
+        waits["max"] = max(waits["max"], wait)
+
+    def _release(self, priority: str) -> None:
+        self.in_flight[priority] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Start queued calls while there is room, background ones only once no interactive call is queued."""
+        for priority in (INTERACTIVE, BACKGROUND):
+            waiters = self.waiters[priority]
+            while waiters and self.in_flight[priority] < self._limit(priority):
+                future = waiters.popleft()
+                if not future.done():
+                    self.in_flight[priority] += 1
+                    future.set_result(None)
+            if waiters:
+                return
+
+    def _record(self, priority: str, latency: float, failed: bool) -> None:
+        now = time.monotonic()
+        self.error_rate += SMOOTHING * (failed - self.error_rate)
+        if priority == INTERACTIVE:
+            self.interactive_latency += SMOOTHING * (latency - self.interactive_latency)
+            self._last_interactive = now
+        slow = now - self._last_interactive < INTERACTIVE_WINDOW and self.interactive_latency > self.latency_target
+        if slow or self.error_rate > self.max_error_rate:
+            if now - self._last_decrease >= self.decrease_interval and self.background_limit > self.background_min:
+                self.background_limit = max(self.background_min, self.background_limit / 2)
+                self.decreases += 1
+                self._last_decrease = now
+                logfire.info(
+                    f"Background API concurrency lowered to {int(self.background_limit)}: interactive latency "
+                    f"{self.interactive_latency:.3f}s, error rate {self.error_rate:.2f}"
+                )
+        elif priority == BACKGROUND and not failed and self.background_limit < self.background_max:
+            self.background_limit = min(self.background_max, self.background_limit + 1 / self.background_limit)
+            self._wake()
+
+    def stats(self) -> dict[str, int | float]:
+        """Queue waits per class in milliseconds, the current background limit and the signals driving it."""
+        stats: dict[str, int | float] = {
+            "background_limit": int(self.background_limit),
+            "background_decreases": self.decreases,
+            "interactive_latency_ms": round(self.interactive_latency * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+        }
+        for priority, waits in self.waits.items():
+            stats[f"{priority}_calls"] = waits["calls"]
+            stats[f"{priority}_queued"] = waits["queued"]
+            stats[f"{priority}_wait_mean_ms"] = round(waits["total"] / max(waits["calls"], 1) * 1000, 1)
+            stats[f"{priority}_wait_max_ms"] = round(waits["max"] * 1000, 1)
+        return stats
+
+
+api_scheduler = ApiScheduler(
+    interactive_limit=int(os.getenv("API_INTERACTIVE_CONCURRENCY", "16")),
+    background_limit=int(os.getenv("API_BACKGROUND_CONCURRENCY", "4")),
+    background_min=int(os.getenv("API_BACKGROUND_MIN_CONCURRENCY", "1")),
+    latency_target=float(os.getenv("API_LATENCY_TARGET", "1.0")),
+    max_error_rate=float(os.getenv("API_MAX_ERROR_RATE", "0.1")),
+    decrease_interval=float(os.getenv("API_DECREASE_INTERVAL", "2.0")),
+)
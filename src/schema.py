@@ -7,7 +7,14 @@ from uuid import UUID
 from pydantic import AnyUrl, BaseModel, Field, field_validator
 
 
-class DiscordGuildJoinUpdatePost(BaseModel):
+class DeferredModel(BaseModel):
+    """Base model whose validator is built on first use instead of at import, keeps bot startup fast."""
+
+    class Config:  # noqa: D106
+        defer_build = True
+
+
+class DiscordGuildJoinUpdatePost(DeferredModel):
     """POST data model to the /guild/join_update/ API endpoint.
 
     Copied from the api server
@@ -56,7 +63,7 @@ class DiscordGuildJoinUpdatePost(BaseModel):
         }
 
 
-class DiscordJoinUpdateResponse(BaseModel):
+class DiscordJoinUpdateResponse(DeferredModel):
     """Copied from API server."""
 
     status: bool
@@ -64,7 +71,7 @@ class DiscordJoinUpdateResponse(BaseModel):
     club_created: bool
 
 
-class DiscordMagicLinkResponse(BaseModel):
+class DiscordMagicLinkResponse(DeferredModel):
     """Copied from api server."""
 
     uuid: UUID | None = None
@@ -72,7 +79,7 @@ class DiscordMagicLinkResponse(BaseModel):
     url: str
 
 
-class LocalGetMagicLinkResponse(BaseModel):
+class LocalGetMagicLinkResponse(DeferredModel):
     """get_magic_link method."""
 
     status_code: int
@@ -86,7 +93,7 @@ class LocalGetMagicLinkResponse(BaseModel):
     uuid: UUID | None
 
 
-class Cyclist(BaseModel):
+class Cyclist(DeferredModel):
     first_name: str
     last_name: str
     usac_id: int | None = None
@@ -102,7 +109,7 @@ class Cyclist(BaseModel):
         extra = "allow"
 
 
-class ZRacing(BaseModel):
+class ZRacing(DeferredModel):
     uuid: UUID
     riderId: int
     name: str
@@ -123,7 +130,7 @@ class ZRacing(BaseModel):
         extra = "allow"
 
 
-class LookUpAthlete(BaseModel):  # noqa: D101
+class LookUpAthlete(DeferredModel):  # noqa: D101
     status_code: int
     status_message: str
     athlete: Cyclist | None = None
@@ -133,7 +140,7 @@ class LookUpAthlete(BaseModel):  # noqa: D101
         extra = "allow"
 
 
-class AthleteResponseDiscord(BaseModel):  # noqa: D101
+class AthleteResponseDiscord(DeferredModel):  # noqa: D101
     uuid: UUID
     first_name: str
     last_name: str
@@ -151,7 +158,7 @@ class AthleteResponseDiscord(BaseModel):  # noqa: D101
 
 
 # Create Pydantic models for request validation
-class CyclistCreate(BaseModel):
+class CyclistCreate(DeferredModel):
     first_name: str
     last_name: str
     birth_year: int
@@ -163,7 +170,7 @@ class CyclistCreate(BaseModel):
     ids: dict | None = {}
 
 
-class CyclistUpdate(BaseModel):
+class CyclistUpdate(DeferredModel):
     first_name: str | None = None
     last_name: str | None = None
     usac_id: int | None = None
@@ -174,7 +181,7 @@ class CyclistUpdate(BaseModel):
     ids: dict | None = None
 
 
-class DiscordServerJoin(BaseModel):
+class DiscordServerJoin(DeferredModel):
     server_id: str
     server_name: str
     owner_id: str
@@ -184,7 +191,7 @@ class DiscordServerJoin(BaseModel):
 
 
 # Response model
-class DiscordServerResponse(BaseModel):
+class DiscordServerResponse(DeferredModel):
     uuid: UUID
     server_id: str
     server_name: str
@@ -197,6 +204,6 @@ class DiscordServerResponse(BaseModel):
     created: datetime
     changed: datetime
 
-    class MagicLink(BaseModel):
+    class MagicLink(DeferredModel):
         uuid: UUID
         token: str
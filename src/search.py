@@ -0,0 +1,211 @@
+"""In-memory athlete search for the ``/lookup_athlete`` autocomplete.
+
+Discord sends an autocomplete request on every keystroke and drops answers that take longer than 3 seconds, so
+suggestions come from this index and never from the API. Athletes are added as lookups succeed (see
+``src/api.py``, roster fetches add whole servers at once) and ``athlete_index_refresh`` in the cyclist cog
+periodically rebuilds the index from the athlete cache and its persistent store, dropping expired athletes.
+
+Names are matched by word prefix and, from three characters on, by trigrams anywhere in the name. Zwift IDs are
+matched by prefix on a sorted list.
+
+The index holds athletes looked up from every guild, callers pass ``include`` to only return the members of the
+guild asking. Only athletes with a registered Discord account can be attributed to a guild.
+"""
+
+import unicodedata
+from bisect import bisect_left, insort
+from collections.abc import Callable, Iterable
+from itertools import islice
+from typing import Any
+
+from src.schema import LookUpAthlete
+
+MAX_CHOICES = 25
+
+
+def normalize(text: str) -> str:
+    """Casefold and strip accents, so 'José' is found by 'jose'."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def trigrams(text: str) -> set[str]:  # noqa: D103
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _entry(names: Iterable[str]) -> tuple[str, tuple[str, ...]] | None:
+    """(display name, normalized names), None if there is no usable name."""
+    names = [n.strip() for n in names if n and n.strip()]
+    if not names:
+        return None
+    return names[0], tuple(dict.fromkeys(normalize(n) for n in names))
+
+
+def lookup_discord_ids(data: LookUpAthlete) -> dict[int, int]:
+    """Zwift ID -> Discord ID of a lookup, empty if the athlete is not registered."""
+    return {data.athlete.zwift_id: data.athlete.discord_id} if data.athlete is not None else {}
+
+
+def lookup_names(data: LookUpAthlete) -> dict[int, list[str]]:
+    """Zwift ID -> names of a lookup, the registered name first."""
+    names: dict[int, list[str]] = {}
+    if data.athlete is not None:
+        names.setdefault(data.athlete.zwift_id, []).append(f"{data.athlete.first_name} {data.athlete.last_name}")
+    if data.zracing is not None:
+        names.setdefault(data.zracing.riderId, []).append(data.zracing.name)
+    return names
+
+
+class AthleteIndex:
+    """Prefix and trigram index of athlete names and Zwift IDs."""
+
+    def __init__(self):
+        # zwift_id -> (display name, normalized names)
+        self.athletes: dict[int, tuple[str, tuple[str, ...]]] = {}
+        self.discord_ids: dict[int, int] = {}
+        self._ids: list[str] = []
+        self._words: list[tuple[str, int]] = []
+        self._trigrams: dict[str, set[int]] = {}
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self.athletes)
+
+    def add(self, zwift_id: int, names: Iterable[str]) -> None:
+        """Index an athlete under one or more names, the first is the one shown, re-adding replaces the names."""
+        entry = _entry(names)
+        if entry is None:
+            return
+        current = self.athletes.get(zwift_id)
+        if current is not None:
+            if current == entry:
+                return
+            self.remove(zwift_id)
+        self._insert(zwift_id, entry, insort)
+
+    def _insert(self, zwift_id: int, entry: tuple[str, tuple[str, ...]], insert: Callable[[list, Any], None]) -> None:
+        self.athletes[zwift_id] = entry
+        insert(self._ids, str(zwift_id))
+        for name in entry[1]:
+            for word in name.split():
+                insert(self._words, (word, zwift_id))
+            for gram in trigrams(name):
+                self._trigrams.setdefault(gram, set()).add(zwift_id)
+
+    def add_lookup(self, data: LookUpAthlete) -> None:
+        """Index the athlete of a successful lookup under its registered and ZRacing names."""
+        for zwift_id, names in lookup_names(data).items():
+            self.add(zwift_id, names)
+        self.discord_ids.update(lookup_discord_ids(data))
+
+    def remove(self, zwift_id: int) -> None:  # noqa: D102
+        entry = self.athletes.pop(zwift_id, None)
+        self.discord_ids.pop(zwift_id, None)
+        if entry is None:
+            return
+        self._ids.pop(bisect_left(self._ids, str(zwift_id)))
+        for name in entry[1]:
+            for word in name.split():
+                i = bisect_left(self._words, (word, zwift_id))
+                if i < len(self._words) and self._words[i] == (word, zwift_id):
+                    self._words.pop(i)
+            for gram in trigrams(name):
+                ids = self._trigrams.get(gram)
+                if ids is not None:
+                    ids.discard(zwift_id)
+                    if not ids:
+                        del self._trigrams[gram]
+
+    def replace(self, other: "AthleteIndex") -> None:
+        """Take over the contents of ``other``, a fully built index, in one step."""
+        self.athletes, self.discord_ids, self._ids, self._words, self._trigrams = (
+            other.athletes,
+            other.discord_ids,
+            other._ids,
+            other._words,
+            other._trigrams,
+        )
+
+    def search(
+        self, query: str, limit: int = MAX_CHOICES, include: Callable[[int], bool] = lambda _: True
+    ) -> list[tuple[int, str]]:
+        """Best matches for what the user typed so far, as (zwift_id, display name).
+
+        Digits match Zwift IDs by prefix. Text ranks names starting with the query first, then names with a word
+        starting with it, then names containing it. Athletes ``include`` rejects are skipped.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        if query.isdigit():
+            ids = (int(i) for i in self._prefixed(self._ids, query) if include(int(i)))
+            return [(zwift_id, self.athletes[zwift_id][0]) for zwift_id in islice(ids, limit)]
+
+        ranked: dict[int, int] = {}
+        first_word = query.split()[0]
+        for _word, zwift_id in self._prefixed_words(first_word):
+            if not include(zwift_id):
+                continue
+            names = self.athletes[zwift_id][1]
+            if any(name.startswith(query) for name in names):
+                ranked[zwift_id] = 0
+            elif any(query in name for name in names):
+                ranked.setdefault(zwift_id, 1)
+        if len(query) >= 3 and len(ranked) < limit:
+            for zwift_id in self._trigram_candidates(query):
+                if zwift_id in ranked or not include(zwift_id):
+                    continue
+                if any(query in name for name in self.athletes[zwift_id][1]):
+                    ranked[zwift_id] = 2
+        best = sorted(ranked, key=lambda i: (ranked[i], self.athletes[i][0].casefold()))[:limit]
+        return [(zwift_id, self.athletes[zwift_id][0]) for zwift_id in best]
+
+    def find(self, name: str, include: Callable[[int], bool] = lambda _: True) -> int | None:
+        """Zwift ID of the only included athlete with exactly this name, None if there is none or several."""
+        name = normalize(name)
+        words = name.split()
+        if not words:
+            return None
+        matches = {
+            zwift_id
+            for word, zwift_id in self._prefixed_words(words[0])
+            if word == words[0] and name in self.athletes[zwift_id][1] and include(zwift_id)
+        }
+        return matches.pop() if len(matches) == 1 else None
+
+    def _prefixed_words(self, prefix: str) -> Iterable[tuple[str, int]]:
+        i = bisect_left(self._words, (prefix, -1))
+        while i < len(self._words) and self._words[i][0].startswith(prefix):
+            yield self._words[i]
+            i += 1
+
+    @staticmethod
+    def _prefixed(values: list[str], prefix: str) -> Iterable[str]:
+        i = bisect_left(values, prefix)
+        while i < len(values) and values[i].startswith(prefix):
+            yield values[i]
+            i += 1
+
+    def _trigram_candidates(self, query: str) -> set[int]:
+        sets = sorted((self._trigrams.get(gram, set()) for gram in trigrams(query)), key=len)
+        if not sets or not sets[0]:
+            return set()
+        return set.intersection(*sets)
+
+
+def build_index(lookups: Iterable[LookUpAthlete]) -> AthleteIndex:
+    """Fresh index of the athletes of ``lookups``, sorted once at the end rather than on every insert."""
+    athletes: dict[int, list[str]] = {}
+    index = AthleteIndex()
+    for data in lookups:
+        athletes.update(lookup_names(data))
+        index.discord_ids.update(lookup_discord_ids(data))
+    for zwift_id, names in athletes.items():
+        entry = _entry(names)
+        if entry is not None:
+            index._insert(zwift_id, entry, list.append)
+    index._ids.sort()
+    index._words.sort()
+    return index
+
+
+athlete_index = AthleteIndex()
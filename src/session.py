@@ -0,0 +1,168 @@
+"""Gateway session persistence, RESUME the previous session after a quick restart instead of a fresh IDENTIFY.
+
+On a graceful shutdown the session id, sequence number and resume URL are written to ``GATEWAY_SESSION_FILE``
+and the websocket is closed with a code that keeps the session alive on Discord's side. The next start within
+``GATEWAY_RESUME_WINDOW`` seconds sends RESUME with them, Discord then only replays the events missed while the
+process was down. If Discord refuses (INVALID_SESSION) the connect loop falls back to IDENTIFY as usual.
+
+The resume path relies on py-cord internals (``_connection._handle_ready``, ``_add_guild_from_data``,
+``_closed``), py-cord is pinned in ``pyproject.toml`` for that reason, re-check this module when bumping it.
+
+A RESUME skips READY and the GUILD_CREATE burst, so the new process starts with an empty guild cache and
+``on_ready`` is not dispatched by py-cord. ``ResumableBot`` rebuilds the guilds (with channels and roles) over
+REST and then dispatches ``ready`` itself, members are chunked in the background after that.
+"""
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+import aiohttp
+import discord
+import logfire
+from discord.gateway import DiscordWebSocket, ReconnectWebSocket
+
+from src.request_policy import close_client
+
+# Closing with 1000 or 1001 invalidates the session, any other code keeps it resumable.
+RESUMABLE_CLOSE_CODE = 4000
+REBUILD_CONCURRENCY = 5
+
+
+def session_file() -> Path:  # noqa: D103
+    return Path(os.getenv("GATEWAY_SESSION_FILE", "data/gateway_session.json"))
+
+
+def save_session(ws: DiscordWebSocket, application_id: int | None) -> None:
+    """Write what a RESUME needs, readable by the owner only."""
+    path = session_file()
+    session = {
+        "session_id": ws.session_id,
+        "sequence": ws.sequence,
+        "resume_gateway_url": ws.resume_gateway_url,
+        "application_id": application_id,
+        "saved_at": time.time(),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch(mode=0o600, exist_ok=True)
+    path.write_text(json.dumps(session))
+    # touch() leaves the mode of an existing file alone.
+    os.chmod(path, 0o600)
+    logfire.info(f"Gateway session saved to {path}, sequence {ws.sequence}")
+
+
+def load_session() -> dict | None:
+    """Read and delete the saved session, None if there is none or it is older than the resume window.
+
+    The file is removed either way, a session is resumed at most once.
+    """
+    path = session_file()
+    try:
+        session = json.loads(path.read_text())
+        path.unlink()
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logfire.warn(f"Ignoring unreadable gateway session file {path}: {e!s}")
+        path.unlink(missing_ok=True)
+        return None
+    age = time.time() - session.get("saved_at", 0)
+    if age > float(os.getenv("GATEWAY_RESUME_WINDOW", "60")):
+        logfire.info(f"Saved gateway session is {age:.0f}s old, identifying instead")
+        return None
+    return session
+
+
+class ResumableBot(discord.Bot):
+    """``discord.Bot`` that saves its gateway session on close and resumes it on the next start."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # True from a RESUME of a saved session until the guild cache is rebuilt.
+        self.restoring = False
+        self.add_listener(self._restore_after_resume, "on_resumed")
+
+    async def connect(self, *, reconnect: bool = True) -> None:
+        """Resume the saved session if there is one, ``Client.connect`` takes over once that connection ends.
+
+        Only the first connection is resumed from disk: if it drops, or Discord refuses the RESUME, the regular
+        connect loop identifies and resumes from then on as it always does.
+        """
+        saved = load_session()
+        if saved is not None:
+            await self._connect_resumed(saved)
+        if not self.is_closed():
+            await super().connect(reconnect=reconnect)
+
+    async def _connect_resumed(self, saved: dict) -> None:
+        logfire.info(f"Resuming gateway session {saved['session_id']} at sequence {saved['sequence']}")
+        self.restoring = True
+        self._connection.application_id = saved["application_id"]
+        gateway = f"{saved['resume_gateway_url']}?encoding=json&v={discord.http.API_VERSION}&compress=zlib-stream"
+        try:
+            coro = DiscordWebSocket.from_client(
+                self,
+                initial=True,
+                gateway=gateway,
+                shard_id=self.shard_id,
+                session=saved["session_id"],
+                sequence=saved["sequence"],
+                resume=True,
+            )
+            self.ws = await asyncio.wait_for(coro, timeout=60.0)
+            # Only set from READY, which a resumed session does not get.
+            self.ws.resume_gateway_url = saved["resume_gateway_url"]
+            while True:
+                await self.ws.poll_event()
+        except ReconnectWebSocket as e:
+            if not e.resume:
+                logfire.info("Saved gateway session was not resumable, identifying")
+        except (
+            OSError,
+            discord.HTTPException,
+            discord.GatewayNotFound,
+            discord.ConnectionClosed,
+            aiohttp.ClientError,
+            TimeoutError,
+        ) as e:
+            if not self.is_closed():
+                logfire.warn(f"Resumed gateway connection ended ({e!r}), identifying")
+        self.restoring = False
+        self.dispatch("disconnect")
+
+    async def _restore_after_resume(self) -> None:
+        if not self.restoring:
+            return
+        with logfire.span("Rebuild guild cache after resume"):
+            guild_ids = [guild.id async for guild in self.fetch_guilds(limit=None)]
+            semaphore = asyncio.Semaphore(REBUILD_CONCURRENCY)
+
+            async def rebuild(guild_id: int) -> None:
+                async with semaphore:
+                    data = await self.http.get_guild(guild_id, with_counts=True)
+                    data["channels"] = await self.http.get_all_guild_channels(guild_id)
+                    data["member_count"] = data.get("approximate_member_count")
+                    self._connection._add_guild_from_data(data)
+
+            results = await asyncio.gather(*(rebuild(guild_id) for guild_id in guild_ids), return_exceptions=True)
+            failed = [e for e in results if isinstance(e, Exception)]
+            for e in failed:
+                logfire.error(f"Failed to rebuild a guild after resume: {e!s}")
+            logfire.info(f"Rebuilt {len(guild_ids) - len(failed)} of {len(guild_ids)} guilds after resume")
+        self.restoring = False
+        self._handle_ready()
+        self.dispatch("ready")
+
+    async def close(self) -> None:
+        """Save the session and close the websocket without invalidating it, then close as usual and the API client."""
+        ws = self.ws
+        if not self.is_closed() and ws is not None and ws.open and ws.session_id and not self.restoring:
+            save_session(ws, self.application_id)
+            # Closed first so connect() does not treat the socket closing as a connection drop to reconnect.
+            self._closed = True
+            await ws.close(code=RESUMABLE_CLOSE_CODE)
+            self._closed = False
+        await super().close()
+        await close_client()
@@ -0,0 +1,44 @@
+"""Phase-by-phase startup timing.
+
+Imported first by main.py so the clock starts before anything heavy is loaded. Each ``mark`` closes the phase
+that ran since the previous mark, the breakdown is logged once the bot is ready. Only the stdlib is used here,
+logfire is not configured yet when the first phases are marked.
+"""
+
+import time
+
+
+class StartupTimer:
+    """Record how long each startup phase took, in the order the phases ran."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases: dict[str, float] = {}
+
+    def mark(self, phase: str) -> float:
+        """Close ``phase``, returns its duration in seconds."""
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+        self.last = now
+        return elapsed
+
+    @property
+    def total(self) -> float:
+        """Seconds from process start to the last mark."""
+        return self.last - self.started
+
+    def report(self) -> dict[str, float]:
+        """Phase durations in milliseconds, plus the total."""
+        report = {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()}
+        report["total"] = round(self.total * 1000, 1)
+        return report
+
+    def summary(self) -> str:
+        """One line breakdown for logs, e.g. 'config 40ms, import 520ms, ... total 2.10s'."""
+        parts = [f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases.items()]
+        return ", ".join(parts) + f", total {self.total:.2f}s"
+
+
+startup_timer = StartupTimer()
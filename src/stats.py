@@ -0,0 +1,90 @@
+"""Array-backed rider statistics for roster features like the club leaderboard.
+
+This module imports numpy, the cogs import it from the commands that build a roster or comparison rather than
+at load time. The metric tables they need for their options are in ``src/metrics.py``.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from src.metrics import METRIC_INDEX, METRICS, POWER_DURATIONS, TERRAINS, metric_row, number
+from src.schema import ZRacing
+
+
+class RankedRider(NamedTuple):  # noqa: D101
+    rank: int
+    name: str
+    value: float
+    percentile: float
+
+
+class Roster:
+    """All metrics of a group of riders in one (riders x metrics) float array.
+
+    Built once per guild/role, every metric can then be ranked without touching the API again.
+    """
+
+    def __init__(self, names: list[str], values: np.ndarray):
+        self.names = names
+        self.values = values
+
+    @classmethod
+    def from_records(cls, riders: list[tuple[str, ZRacing]]) -> "Roster":
+        """Build a roster from (display name, ZRacing record) pairs."""
+        values = np.array([metric_row(zr_record) for _, zr_record in riders], dtype=np.float64)
+        return cls([name for name, _ in riders], values.reshape(len(riders), len(METRICS)))
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self.names)
+
+    def ranking(self, metric: str) -> list[RankedRider]:
+        """Riders with a value for ``metric``, best first, with the percentile within the roster.
+
+        Ties share a rank and the next rank is skipped (1, 2, 2, 4), like they share a percentile.
+        """
+        column = self.values[:, METRIC_INDEX[metric]]
+        valid = np.flatnonzero(~np.isnan(column))
+        if valid.size == 0:
+            return []
+        scores = column[valid]
+        order = valid[np.argsort(-scores, kind="stable")]
+        # Riders with a value <= each rider's value, the rest are ranked above it.
+        at_or_below = np.searchsorted(np.sort(scores), column[order], side="right")
+        ranks = valid.size - at_or_below + 1
+        percentiles = at_or_below * (100.0 / valid.size)
+        return [
+            RankedRider(int(rank), self.names[i], float(column[i]), float(p))
+            for i, rank, p in zip(order, ranks, percentiles, strict=True)
+        ]
+
+
+def power_matrix(zr_records: list[ZRacing], prefix: str = "wkg") -> np.ndarray:
+    """(riders x POWER_DURATIONS) array of the ``wkg<seconds>`` or ``w<seconds>`` power values, NaN if missing."""
+    return np.array(
+        [[number((zr.power or {}).get(f"{prefix}{s}")) for s in POWER_DURATIONS] for zr in zr_records],
+        dtype=np.float64,
+    ).reshape(len(zr_records), len(POWER_DURATIONS))
+
+
+def handicap_matrix(zr_records: list[ZRacing]) -> np.ndarray:
+    """(riders x TERRAINS) array of the handicap profile, NaN if missing."""
+    profiles = [(zr.handicaps or {}).get("profile") or {} for zr in zr_records]
+    return np.array([[number(profile.get(t)) for t in TERRAINS] for profile in profiles], dtype=np.float64).reshape(
+        len(zr_records), len(TERRAINS)
+    )
+
+
+def percent_of_best(matrix: np.ndarray) -> np.ndarray:
+    """Each value as a percentage of the best value in its column, NaN stays NaN."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        best = np.max(np.where(np.isnan(matrix), -np.inf, matrix), axis=0, initial=-np.inf)
+        return matrix / np.where(best > 0, best, np.nan) * 100.0
+
+
+def column_ranks(matrix: np.ndarray) -> np.ndarray:
+    """Rank of each value within its column, 1 is the highest, NaN values get rank 0."""
+    order = np.argsort(np.where(np.isnan(matrix), np.inf, -matrix), axis=0, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, matrix.shape[0] + 1)[:, None], axis=0)
+    return np.where(np.isnan(matrix), 0, ranks)
@@ -0,0 +1,139 @@
+"""Reusable UI views for the cogs."""
+
+import asyncio
+import math
+import os
+from collections import OrderedDict, defaultdict
+from collections.abc import Callable, Sequence
+from typing import Any
+
+import discord
+import logfire
+from discord import ButtonStyle, Embed, ui
+
+# Field values are limited to 1024 characters by Discord.
+EMBED_FIELD_LIMIT = 1024
+
+
+def truncate_list(items: list[str], limit: int = EMBED_FIELD_LIMIT, sep: str = ", ") -> str:
+    """Join as many items as fit in ``limit`` characters, the rest is summarized as '+N more'."""
+    text = ""
+    for i, item in enumerate(items):
+        more = f"{sep}+{len(items) - i} more"
+        candidate = f"{text}{sep}{item}" if text else item
+        if len(candidate) + (len(more) if i < len(items) - 1 else 0) > limit:
+            return f"{text}{more}" if text else more.removeprefix(sep)
+        text = candidate
+    return text or "_"
+
+
+class PaginatedView(ui.View):
+    """Page through a large result set one embed at a time.
+
+    Nothing is pre-rendered: ``fetch(offset, limit)`` returns the items of a page and ``render(items, page, pages)``
+    turns them into an embed when the page is shown. Views time out when idle, and at most
+    ``MAX_VIEWS_PER_GUILD`` are live per guild, the oldest one is expired when a new one goes over the cap.
+    """
+
+    def __init__(
+        self,
+        guild_id: int | None,
+        total: int,
+        fetch: Callable[[int, int], Sequence[Any]],
+        render: Callable[[Sequence[Any], int, int], Embed],
+        per_page: int = 10,
+        timeout: float = 180.0,
+    ):
+        super().__init__(timeout=timeout, disable_on_timeout=True)
+        self.guild_id = guild_id
+        self.total = total
+        self.fetch = fetch
+        self.render = render
+        self.per_page = per_page
+        self.page = 0
+
+    @property
+    def pages(self) -> int:  # noqa: D102
+        return max(1, math.ceil(self.total / self.per_page))
+
+    def current_embed(self) -> Embed:
+        """Render the current page."""
+        items = self.fetch(self.page * self.per_page, self.per_page)
+        return self.render(items, self.page, self.pages)
+
+    def _update_buttons(self) -> None:
+        self.first_page.disabled = self.previous_page.disabled = self.page == 0
+        self.last_page.disabled = self.next_page.disabled = self.page >= self.pages - 1
+
+    async def send(self, ctx: discord.ApplicationContext, ephemeral: bool = True) -> None:
+        """Respond with the first page, without buttons if everything fits on one page."""
+        if self.pages == 1:
+            self.stop()
+            await ctx.respond(embed=self.current_embed(), ephemeral=ephemeral)
+            return
+        _register(self)
+        self._update_buttons()
+        await ctx.respond(embed=self.current_embed(), view=self, ephemeral=ephemeral)
+
+    async def _show(self, interaction: discord.Interaction, page: int) -> None:
+        self.page = min(max(page, 0), self.pages - 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.current_embed(), view=self)
+
+    @ui.button(label="⏮", style=ButtonStyle.secondary)
+    async def first_page(self, _button: ui.Button, interaction: discord.Interaction):  # noqa: D102
+        await self._show(interaction, 0)
+
+    @ui.button(label="◀", style=ButtonStyle.primary)
+    async def previous_page(self, _button: ui.Button, interaction: discord.Interaction):  # noqa: D102
+        await self._show(interaction, self.page - 1)
+
+    @ui.button(label="▶", style=ButtonStyle.primary)
+    async def next_page(self, _button: ui.Button, interaction: discord.Interaction):  # noqa: D102
+        await self._show(interaction, self.page + 1)
+
+    @ui.button(label="⏭", style=ButtonStyle.secondary)
+    async def last_page(self, _button: ui.Button, interaction: discord.Interaction):  # noqa: D102
+        await self._show(interaction, self.pages - 1)
+
+    async def on_timeout(self) -> None:  # noqa: D102
+        _unregister(self)
+        try:
+            await super().on_timeout()
+        except discord.HTTPException as e:
+            logfire.info(f"Could not disable expired view: {e!s}")
+
+    def stop(self) -> None:  # noqa: D102
+        _unregister(self)
+        super().stop()
+
+
+MAX_VIEWS_PER_GUILD = int(os.getenv("MAX_VIEWS_PER_GUILD", "25"))
+LIVE_VIEWS: defaultdict[int | None, OrderedDict[str, PaginatedView]] = defaultdict(OrderedDict)
+_expiring: set[asyncio.Task] = set()
+
+
+def _register(view: PaginatedView) -> None:
+    views = LIVE_VIEWS[view.guild_id]
+    views[view.id] = view
+    while len(views) > MAX_VIEWS_PER_GUILD:
+        _, oldest = views.popitem(last=False)
+        logfire.info(f"Too many live views in guild {view.guild_id}, expiring {oldest.id}")
+        # Same as an idle timeout: stop listening and grey out the buttons.
+        oldest.stop()
+        task = asyncio.get_running_loop().create_task(oldest.on_timeout())
+        _expiring.add(task)
+        task.add_done_callback(_expiring.discard)
+
+
+def _unregister(view: PaginatedView) -> None:
+    views = LIVE_VIEWS.get(view.guild_id)
+    if views is not None:
+        views.pop(view.id, None)
+        if not views:
+            del LIVE_VIEWS[view.guild_id]
+
+
+def live_view_count() -> int:
+    """Live paginated views across all guilds."""
+    return sum(len(views) for views in LIVE_VIEWS.values())